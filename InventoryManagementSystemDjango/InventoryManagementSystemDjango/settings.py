@@ -9,6 +9,7 @@ https://docs.djangoproject.com/en/6.0/topics/settings/
 For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -37,11 +38,16 @@ INSTALLED_APPS = [
     'users',
     'orders',
     'products',
+    'core',
     'rest_framework',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.QueryInstrumentationMiddleware',
+    'core.middleware.ShardRoutingMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -73,11 +79,181 @@ WSGI_APPLICATION = 'InventoryManagementSystemDjango.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# The database profile is chosen with environment variables:
+#   DB_ENGINE=sqlite (default) or postgresql, DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT
+#   DB_CONN_MAX_AGE  seconds to keep a connection open between requests (0 closes it after each request)
+#   DB_POOL=1        PostgreSQL only: use psycopg's connection pool (DB_POOL_MIN_SIZE / DB_POOL_MAX_SIZE)
+#                    instead of persistent connections
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite')
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', '60'))
+
+if DB_ENGINE == 'postgresql':
+    DB_POOL = os.environ.get('DB_POOL', '0') == '1'
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DB_NAME', 'inventory'),
+            'USER': os.environ.get('DB_USER', ''),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', ''),
+            'PORT': os.environ.get('DB_PORT', ''),
+            # Django refuses persistent connections together with a pool; the pool keeps them open instead.
+            'CONN_MAX_AGE': 0 if DB_POOL else DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'pool': {
+                    'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', '2')),
+                    'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', '20')),
+                    'timeout': 10,
+                },
+            } if DB_POOL else {},
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                # Take the write lock at BEGIN so concurrent writers queue on busy_timeout instead of
+                # failing with "database is locked" when a read transaction tries to upgrade.
+                'transaction_mode': 'IMMEDIATE',
+                'timeout': 5,
+            },
+        }
     }
+
+# Read replicas: DB_REPLICAS is a comma-separated list of SQLite files, or of host[:port] entries that share the
+# other PostgreSQL settings. core.routers.ReplicaRouter sends the reads of GET/HEAD/OPTIONS requests to a random
+# healthy replica. Everything else, and every request from a seller who wrote in the last
+# READ_YOUR_WRITES_SECONDS, uses the primary. An unreachable replica is skipped for REPLICA_RETRY_SECONDS.
+# The write pins are kept in the default cache, so use a shared cache backend when running several workers.
+REPLICA_DATABASES = []
+for index, replica in enumerate(r.strip() for r in os.environ.get('DB_REPLICAS', '').split(',') if r.strip()):
+    alias = f'replica_{index}'
+    DATABASES[alias] = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+    if DB_ENGINE == 'postgresql':
+        host, _, port = replica.partition(':')
+        DATABASES[alias].update(HOST=host, PORT=port or DATABASES['default']['PORT'])
+    else:
+        # Replicas are only read, so they take no write lock at BEGIN. Under the test runner a mirror opens the
+        # primary's in-memory database, where a second BEGIN IMMEDIATE would fail with "database table is locked".
+        options = {key: value for key, value in DATABASES['default']['OPTIONS'].items() if key != 'transaction_mode'}
+        DATABASES[alias].update(NAME=replica, OPTIONS=options)
+    REPLICA_DATABASES.append(alias)
+
+# Sharding: DB_SHARDS is a comma-separated list of extra databases in the same format as DB_REPLICAS.
+# core.routers.ShardRouter keeps each seller's products, orders and their side tables on one of
+# SHARD_DATABASES ("default" is the first shard), looked up in core.models.SellerShard and cached for
+# SHARD_CACHE_TTL seconds. New sellers are spread by id; `manage.py move_seller` moves one between shards.
+# Sellers without a SellerShard row live on "default". Run `manage.py migrate --database shard_N` for each shard.
+SHARD_DATABASES = ['default']
+for index, shard in enumerate((s.strip() for s in os.environ.get('DB_SHARDS', '').split(',') if s.strip()), start=1):
+    alias = f'shard_{index}'
+    DATABASES[alias] = dict(DATABASES['default'])
+    if DB_ENGINE == 'postgresql':
+        host, _, port = shard.partition(':')
+        DATABASES[alias].update(HOST=host, PORT=port or DATABASES['default']['PORT'])
+    else:
+        DATABASES[alias]['NAME'] = shard
+    SHARD_DATABASES.append(alias)
+
+DATABASE_ROUTERS = ['core.routers.ShardRouter', 'core.routers.ReplicaRouter']
+READ_YOUR_WRITES_SECONDS = 5
+REPLICA_RETRY_SECONDS = 30
+SHARD_CACHE_TTL = 5
+
+# Applied to every new SQLite connection by core.db.configure_sqlite (see CoreConfig.ready).
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+}
+
+# Cache
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+
+# The local-memory cache is private to each worker process. Deployments with several workers should set
+# CACHE_REDIS_URL (e.g. redis://localhost:6379/0, needs the redis package) so that invalidations reach every worker.
+if os.environ.get('CACHE_REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['CACHE_REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Authenticated sellers are cached in Django's cache for SELLER_CACHE_TTL seconds
+# and in a per-process LRU of SELLER_CACHE_LOCAL_MAXSIZE entries for SELLER_CACHE_LOCAL_TTL seconds.
+# A change to a seller reaches other workers within SELLER_CACHE_LOCAL_TTL with a shared cache. With the
+# local-memory cache, core.cache caps SELLER_CACHE_TTL at SELLER_CACHE_LOCAL_TTL to keep the same bound.
+SELLER_CACHE_TTL = 300
+SELLER_CACHE_LOCAL_TTL = 5
+SELLER_CACHE_LOCAL_MAXSIZE = 1024
+
+# Access tokens are short lived. Clients exchange the long-lived refresh token at /sellers/token/refresh
+# for a new pair instead of logging in again.
+JWT_ACCESS_TOKEN_MINUTES = 30
+JWT_REFRESH_TOKEN_DAYS = 14
+
+# /metrics answers clients whose address falls in METRICS_ALLOWED_IPS (addresses or networks, comma-separated in the
+# environment) and requests carrying "Authorization: Bearer <METRICS_TOKEN>". Everyone else gets 403.
+METRICS_ALLOWED_IPS = [ip.strip() for ip in os.environ.get('METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',')
+                       if ip.strip()]
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Password hashes are verified by PASSWORD_WORKERS background threads. At most PASSWORD_QUEUE_SIZE further
+# logins may wait for a worker; beyond that, login answers 503 straight away. A waiting sync login holds its
+# request thread, so keep PASSWORD_WORKERS + PASSWORD_QUEUE_SIZE well below the request threads of one server
+# process (e.g. gunicorn --threads). The default of no queue answers 503 as soon as every worker is busy.
+PASSWORD_WORKERS = int(os.environ.get('PASSWORD_WORKERS', '4'))
+PASSWORD_QUEUE_SIZE = int(os.environ.get('PASSWORD_QUEUE_SIZE', '0'))
+
+# Products at or below this quantity are counted as low stock in the inventory summary.
+LOW_STOCK_THRESHOLD = 10
+
+# `manage.py snapshot_stock` snapshots the stock ledger as of this many seconds ago, leaving time for
+# transactions that already wrote their movements to commit.
+STOCK_SNAPSHOT_LAG_SECONDS = 60
+
+# Django REST framework
+# https://www.django-rest-framework.org/api-guide/settings/
+
+# FastJSONRenderer encodes with orjson (falling back to the stdlib when it isn't installed) and
+# produces the same JSON values as DRF's JSONRenderer (see core/renderers.py for the differences).
+REST_FRAMEWORK = {
+    "DEFAULT_RENDERER_CLASSES": [
+        "core.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+}
+
+# Logging
+# https://docs.djangoproject.com/en/6.0/topics/logging/
+
+# core.middleware logs one JSON line per request (SQL count, SQL time, duplicate queries) at INFO and warns when
+# a single query pattern repeats N_PLUS_ONE_THRESHOLD times in one request. The logger below is set to WARNING, so
+# only those warnings are printed; set its level to INFO to see every request.
+N_PLUS_ONE_THRESHOLD = 10
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "core.middleware": {"handlers": ["console"], "level": "WARNING", "propagate": False},
+    },
 }
 
 # Password validation
@@ -117,3 +293,16 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
+
+# Media is served by core.views.serve_media with ETag/Last-Modified, 304s and Range support.
+# Set MEDIA_OFFLOAD to "x-accel-redirect" (nginx, internal location at MEDIA_OFFLOAD_PREFIX) or
+# "x-sendfile" (Apache/lighttpd) to let the web server transfer the bytes instead of the worker.
+MEDIA_CACHE_MAX_AGE = 86400
+MEDIA_OFFLOAD = None
+MEDIA_OFFLOAD_PREFIX = "/protected-media/"
+
+# Uploaded product images are re-encoded off the request thread by IMAGE_WORKERS background threads:
+# metadata is stripped, a compressed copy is stored and one thumbnail is made per IMAGE_THUMBNAIL_SIZES entry.
+IMAGE_WORKERS = 2
+IMAGE_COMPRESSED_QUALITY = 80
+IMAGE_THUMBNAIL_SIZES = {"small": 128, "medium": 512}
@@ -0,0 +1,14 @@
+from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_migrate
+
+
+class CoreConfig(AppConfig):
+    name = 'core'
+
+    def ready(self):
+        from core.db import configure_sqlite
+        from core.routers import reserve_shard_ids
+
+        connection_created.connect(configure_sqlite, dispatch_uid="core.configure_sqlite")
+        post_migrate.connect(reserve_shard_ids, dispatch_uid="core.reserve_shard_ids")
@@ -0,0 +1,113 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+
+
+class LocalLRUCache:
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SellerCache:
+    """
+    Two-tier cache for authenticated sellers.
+
+    The in-process LRU answers most lookups without leaving the worker; its
+    short TTL bounds how long another worker can serve a seller after the
+    shared entry in Django's cache has been invalidated.
+
+    That bound only holds when Django's cache is shared between workers. A
+    LocMemCache is private to each process, so an invalidation never reaches
+    the other workers; its entries then live no longer than the local TTL.
+    """
+
+    def __init__(self):
+        local_ttl = getattr(settings, "SELLER_CACHE_LOCAL_TTL", 5)
+        self.local = LocalLRUCache(maxsize=getattr(settings, "SELLER_CACHE_LOCAL_MAXSIZE", 1024), ttl=local_ttl)
+        self.ttl = getattr(settings, "SELLER_CACHE_TTL", 300)
+        if isinstance(caches["default"], LocMemCache):
+            self.ttl = min(self.ttl, local_ttl)
+
+    @staticmethod
+    def key(seller_id):
+        return f"seller:{seller_id}"
+
+    def get(self, seller_id):
+        key = self.key(seller_id)
+        seller = self.local.get(key)
+        if seller is None:
+            seller = cache.get(key)
+            if seller is None:
+                return None
+            self.local.set(key, seller)
+
+        # Views mutate the seller they receive, so never hand out the shared instance.
+        return copy.copy(seller)
+
+    async def aget(self, seller_id):
+        key = self.key(seller_id)
+        seller = self.local.get(key)
+        if seller is None:
+            seller = await cache.aget(key)
+            if seller is None:
+                return None
+            self.local.set(key, seller)
+
+        return copy.copy(seller)
+
+    def set(self, seller):
+        key = self.key(seller.id)
+        seller = copy.copy(seller)
+        self.local.set(key, seller)
+        cache.set(key, seller, self.ttl)
+
+    async def aset(self, seller):
+        key = self.key(seller.id)
+        seller = copy.copy(seller)
+        self.local.set(key, seller)
+        await cache.aset(key, seller, self.ttl)
+
+    def delete(self, seller_id):
+        key = self.key(seller_id)
+        self.local.delete(key)
+        cache.delete(key)
+
+
+seller_cache = SellerCache()
@@ -0,0 +1,91 @@
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageOps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.db.models import F
+
+from core.models import ResourceVersion
+from core.routers import current_shard, get_shard, use_shard, reset_shard
+from products.models import Products
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=getattr(settings, "IMAGE_WORKERS", 2),
+                                           thread_name_prefix="image-worker")
+        return _executor
+
+
+def schedule_image_processing(product):
+    image_name = product.image.name
+    transaction.on_commit(lambda: get_executor().submit(process_product_image, product.seller_id, product.id,
+                                                        image_name),
+                          using=current_shard())
+
+
+def delete_image_variants(product):
+    for name in product.image_variants.values():
+        if default_storage.exists(name):
+            default_storage.delete(name)
+
+
+def encode_jpeg(image, quality):
+    buffer = io.BytesIO()
+    # Saving without exif/icc_profile/info drops the original metadata.
+    image.save(buffer, format="JPEG", quality=quality, optimize=True, progressive=True)
+    return ContentFile(buffer.getvalue())
+
+
+def process_product_image(seller_id, product_id, image_name):
+    close_old_connections()
+    token = None
+    try:
+        token = use_shard(get_shard(seller_id)[0])
+        with default_storage.open(image_name) as source:
+            image = ImageOps.exif_transpose(Image.open(source))
+            image = image.convert("RGB")
+
+        stem = os.path.splitext(os.path.basename(image_name))[0]
+        variants = {}
+
+        compressed = encode_jpeg(image, quality=getattr(settings, "IMAGE_COMPRESSED_QUALITY", 80))
+        variants["compressed"] = default_storage.save(f"products/variants/{product_id}/{stem}.jpg", compressed)
+
+        for label, size in getattr(settings, "IMAGE_THUMBNAIL_SIZES", {"small": 128, "medium": 512}).items():
+            thumbnail = image.copy()
+            thumbnail.thumbnail((size, size), Image.Resampling.LANCZOS)
+            variants[label] = default_storage.save(f"products/variants/{product_id}/{stem}-{label}.jpg",
+                                                   encode_jpeg(thumbnail, quality=85))
+
+        # Only attach the variants if the product still points at the image that was processed.
+        with transaction.atomic(using=current_shard()):
+            updated = Products.objects.filter(id=product_id, image=image_name).update(image_variants=variants,
+                                                                                      version=F("version") + 1)
+            if updated:
+                ResourceVersion.bump(seller_id, "products")
+
+        if not updated:
+            for name in variants.values():
+                default_storage.delete(name)
+
+    except Exception:
+        logger.exception("Processing image %s for product %s failed", image_name, product_id)
+
+    finally:
+        if token is not None:
+            reset_shard(token)
+        close_old_connections()
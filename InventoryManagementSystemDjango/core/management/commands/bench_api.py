@@ -0,0 +1,226 @@
+import datetime
+import json
+import platform
+import random
+import subprocess
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+
+from core.utils import generate_jwt
+from orders.models import Orders, OrderItems
+from products.models import Products
+from users.models import Sellers
+
+# Share of requests per endpoint in the mixed workload.
+ENDPOINT_WEIGHTS = {
+    "POST /sellers/login": 5,
+    "GET /products/": 30,
+    "GET /products/<id>/": 35,
+    "GET /orders/": 15,
+    "POST /orders/": 15,
+}
+
+
+class Command(BaseCommand):
+    help = ("Drive mixed traffic at the main API endpoints and report p50/p95/p99 latency, throughput and "
+            "queries per request. Results are written as JSON so runs on different commits can be compared.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=2000, help="Total requests in the measured run.")
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument("--warmup", type=int, default=100, help="Unmeasured requests sent first.")
+        parser.add_argument("--products", type=int, default=1000, help="Products seeded for the bench seller.")
+        parser.add_argument("--orders", type=int, default=200, help="Orders seeded for the bench seller.")
+        parser.add_argument("--seed", type=int, default=0, help="Seed for the request mix.")
+        parser.add_argument("--output", help="Result file, defaults to benchmarks/<commit>-<timestamp>.json "
+                                             "(ignored by git).")
+        parser.add_argument("--compare", help="Earlier result file to print a comparison against.")
+
+    def handle(self, *args, **options):
+        baseline = self.load(options["compare"]) if options["compare"] else None
+
+        password = "bench-password"
+        seller = Sellers.objects.create(name="bench", username=f"bench-{uuid.uuid4().hex}",
+                                        password=make_password(password))
+        try:
+            product_ids = self.seed(seller, options["products"], options["orders"])
+            context = {"seller": seller,
+                       "password": password,
+                       "product_ids": product_ids,
+                       "headers": {"Authorization": f"Bearer {generate_jwt(seller.id)}"}}
+
+            # The clients send Host: localhost, which ALLOWED_HOSTS may not list outside DEBUG. Every worker may be
+            # logging in at once, so let that many logins wait for a password worker instead of getting 503.
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "localhost"],
+                                   PASSWORD_QUEUE_SIZE=max(getattr(settings, "PASSWORD_QUEUE_SIZE", 0),
+                                                           options["concurrency"])):
+                warmup, _ = self.run(context, options["warmup"], options["concurrency"], options["seed"] + 1)
+                stats, elapsed = self.run(context, options["requests"], options["concurrency"], options["seed"])
+        finally:
+            Sellers.objects.filter(id=seller.id).delete()
+
+        result = {"meta": self.meta(options, elapsed),
+                  "total": self.summarize([s for samples in stats.values() for s in samples], elapsed),
+                  "endpoints": {name: self.summarize(samples, elapsed) for name, samples in sorted(stats.items())}}
+
+        self.report(result, baseline)
+
+        failed = [status_code for run in (warmup, stats) for samples in run.values()
+                  for _, _, status_code in samples if status_code >= 400]
+        if failed:
+            raise CommandError(f"{len(failed)} requests failed (status {', '.join(map(str, sorted(set(failed))))}); "
+                               f"results not written")
+
+        output = Path(options["output"] or Path(settings.BASE_DIR) / "benchmarks" /
+                      f"{result['meta']['commit']}-{datetime.datetime.now():%Y%m%d%H%M%S}.json")
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(result, indent=2))
+        self.stdout.write(f"Results written to {output}")
+
+    def seed(self, seller, product_count, order_count):
+        products = Products.objects.bulk_create(
+            Products(seller=seller, name=f"bench product {i}", price=10 + i % 90, quantity=1_000_000,
+                     category=f"category-{i % 10}") for i in range(product_count))
+        orders = Orders.objects.bulk_create(Orders(seller=seller, order_type="INCOMING", total_price=30)
+                                            for _ in range(order_count))
+        OrderItems.objects.bulk_create(OrderItems(order=order, product=products[(o * 3 + n) % product_count],
+                                                  quantity=1, price_at_time=10, total=10)
+                                       for o, order in enumerate(orders) for n in range(3))
+        return [p.id for p in products]
+
+    def request(self, client, name, context, rnd):
+        headers = context["headers"]
+        if name == "POST /sellers/login":
+            return client.post("/sellers/login", {"username": context["seller"].username,
+                                                  "password": context["password"]},
+                               content_type="application/json")
+        if name == "GET /products/":
+            return client.get("/products/", {"limit": 50}, headers=headers)
+        if name == "GET /products/<id>/":
+            return client.get(f"/products/{rnd.choice(context['product_ids'])}/", headers=headers)
+        if name == "GET /orders/":
+            return client.get("/orders/", {"limit": 50}, headers=headers)
+        if name == "POST /orders/":
+            items = [{"product_id": product_id, "quantity": 1}
+                     for product_id in rnd.sample(context["product_ids"], 3)]
+            return client.post("/orders/", {"order_type": rnd.choice(["INCOMING", "OUTGOING"]), "items": items},
+                               content_type="application/json", headers=headers)
+        raise CommandError(f"Unknown endpoint {name}")
+
+    def run(self, context, requests, concurrency, seed):
+        names = list(ENDPOINT_WEIGHTS)
+        weights = list(ENDPOINT_WEIGHTS.values())
+        stats = {name: [] for name in names}
+        lock = threading.Lock()
+
+        def worker(index, count):
+            rnd = random.Random(seed * 1000 + index)
+            client = Client(SERVER_NAME="localhost")
+            samples = []
+            queries = 0
+
+            def count_queries(execute, sql, params, many, query_context):
+                nonlocal queries
+                queries += 1
+                return execute(sql, params, many, query_context)
+
+            try:
+                with connection.execute_wrapper(count_queries):
+                    for _ in range(count):
+                        name = rnd.choices(names, weights)[0]
+                        queries = 0
+                        start = time.perf_counter()
+                        response = self.request(client, name, context, rnd)
+                        latency = time.perf_counter() - start
+                        samples.append((name, latency, queries, response.status_code))
+            finally:
+                connection.close()
+
+            with lock:
+                for name, latency, query_count, status_code in samples:
+                    stats[name].append((latency, query_count, status_code))
+
+        per_worker = [requests // concurrency + (1 if i < requests % concurrency else 0) for i in range(concurrency)]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(worker, range(concurrency), per_worker))
+        return stats, time.perf_counter() - start
+
+    def summarize(self, samples, elapsed):
+        latencies = sorted(latency for latency, _, _ in samples)
+        if not latencies:
+            return {"requests": 0}
+
+        def percentile(p):
+            return round(latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))] * 1000, 3)
+
+        errors = sum(1 for _, _, status_code in samples if status_code >= 400)
+        return {"requests": len(samples),
+                "errors": errors,
+                "throughput_rps": round(len(samples) / elapsed, 2),
+                "p50_ms": percentile(50),
+                "p95_ms": percentile(95),
+                "p99_ms": percentile(99),
+                "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3),
+                "queries_per_request": round(sum(q for _, q, _ in samples) / len(samples), 2)}
+
+    def meta(self, options, elapsed):
+        try:
+            commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=settings.BASE_DIR,
+                                    capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = "unknown"
+
+        return {"commit": commit,
+                "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "database": connection.vendor,
+                "elapsed_s": round(elapsed, 3),
+                "options": {key: options[key] for key in ["requests", "concurrency", "warmup", "products",
+                                                          "orders", "seed"]},
+                "weights": ENDPOINT_WEIGHTS}
+
+    def load(self, path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Cannot read {path}: {e}")
+
+    def report(self, result, baseline):
+        self.stdout.write(f"{'endpoint':<22} {'reqs':>6} {'err':>4} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} "
+                          f"{'p99 ms':>8} {'queries':>8}")
+        rows = list(result["endpoints"].items()) + [("total", result["total"])]
+        for name, row in rows:
+            if not row["requests"]:
+                continue
+            self.stdout.write(f"{name:<22} {row['requests']:>6} {row['errors']:>4} {row['throughput_rps']:>8.1f} "
+                              f"{row['p50_ms']:>8.2f} {row['p95_ms']:>8.2f} {row['p99_ms']:>8.2f} "
+                              f"{row['queries_per_request']:>8.2f}")
+
+        if not baseline:
+            return
+
+        self.stdout.write(f"\nCompared with {baseline['meta'].get('commit', '?')}:")
+        self.stdout.write(f"{'endpoint':<22} {'p50':>9} {'p95':>9} {'p99':>9} {'queries':>9}")
+        for name, row in rows:
+            before = baseline["endpoints"].get(name) if name != "total" else baseline.get("total")
+            if not before or not before.get("requests") or not row["requests"]:
+                continue
+
+            def change(key):
+                return f"{(row[key] - before[key]) / before[key] * 100:+.1f}%" if before[key] else "n/a"
+
+            self.stdout.write(f"{name:<22} {change('p50_ms'):>9} {change('p95_ms'):>9} {change('p99_ms'):>9} "
+                              f"{change('queries_per_request'):>9}")
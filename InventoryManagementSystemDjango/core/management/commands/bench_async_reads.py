@@ -0,0 +1,88 @@
+import asyncio
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import AsyncClient, Client, override_settings
+
+from core.utils import generate_jwt
+from orders.models import Orders, OrderItems
+from products.models import Products
+from users.models import Sellers
+
+
+class Command(BaseCommand):
+    help = ("Compare requests/sec of the sync (APIView) and async read endpoints at a given concurrency, using "
+            "Django's in-process test clients. This measures the views and middleware, not WSGI against ASGI "
+            "serving: no server, sockets or slow clients are involved.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=500, help="Requests per endpoint.")
+        parser.add_argument("--concurrency", type=int, default=64)
+
+    def handle(self, *args, **options):
+        seller = Sellers.objects.create(name="bench", username=f"bench-{uuid.uuid4().hex}", password="!")
+        try:
+            endpoints = self.seed(seller)
+            headers = {"Authorization": f"Bearer {generate_jwt(seller.id)}"}
+
+            failed = 0
+            self.stdout.write(f"{'endpoint':<28} {'sync req/s':>11} {'errors':>7} {'async req/s':>12} {'errors':>7}")
+            # The test clients send Host: testserver, which ALLOWED_HOSTS only allows under the test runner.
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):
+                for label, sync_path, async_path in endpoints:
+                    sync_rps, sync_errors = self.run_sync(sync_path, headers, options["requests"],
+                                                          options["concurrency"])
+                    async_rps, async_errors = asyncio.run(self.run_async(async_path, headers, options["requests"],
+                                                                         options["concurrency"]))
+                    failed += sync_errors + async_errors
+                    self.stdout.write(f"{label:<28} {sync_rps:>11.1f} {sync_errors:>7} {async_rps:>12.1f} "
+                                      f"{async_errors:>7}")
+        finally:
+            Sellers.objects.filter(id=seller.id).delete()
+
+        if failed:
+            raise CommandError(f"{failed} requests did not return 200; the throughput above is not comparable")
+
+    def seed(self, seller):
+        products = Products.objects.bulk_create(
+            Products(seller=seller, name=f"bench-{i}", price=10, quantity=100, category="bench") for i in range(200))
+        orders = Orders.objects.bulk_create(Orders(seller=seller, order_type="INCOMING") for _ in range(50))
+        OrderItems.objects.bulk_create(
+            OrderItems(order=order, product=products[i], quantity=1, price_at_time=10, total=10)
+            for order in orders for i in range(5))
+
+        return [("GET /products/", "/products/", "/products/async/"),
+                ("GET /products/<id>/", f"/products/{products[0].id}/", f"/products/async/{products[0].id}/"),
+                ("GET /orders/", "/orders/", "/orders/async/"),
+                ("GET /sellers/<id>", f"/sellers/{seller.id}", f"/sellers/async/{seller.id}")]
+
+    def run_sync(self, path, headers, requests, concurrency):
+        def worker(count):
+            client = Client()
+            try:
+                return sum(1 for _ in range(count) if client.get(path, headers=headers).status_code != 200)
+            finally:
+                connection.close()
+
+        per_worker = [requests // concurrency + (1 if i < requests % concurrency else 0) for i in range(concurrency)]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            errors = sum(executor.map(worker, per_worker))
+        return (requests / (time.perf_counter() - start), errors)
+
+    async def run_async(self, path, headers, requests, concurrency):
+        client = AsyncClient()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch():
+            async with semaphore:
+                response = await client.get(path, headers=headers)
+                return response.status_code != 200
+
+        start = time.perf_counter()
+        errors = sum(await asyncio.gather(*(fetch() for _ in range(requests))))
+        return (requests / (time.perf_counter() - start), errors)
@@ -0,0 +1,134 @@
+import multiprocessing
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection, connections
+from django.test import override_settings
+
+from core.utils import create_order, get_orders_for_seller
+from products.models import Products
+from users.models import Sellers
+
+# What settings.py configured before the database profile: rollback journal, deferred transactions and the
+# sqlite3 module's default busy timeout.
+SQLITE_BASELINE = {"options": {}, "pragmas": {"journal_mode": "DELETE", "synchronous": "FULL"}}
+
+
+class Command(BaseCommand):
+    help = ("Create orders from concurrent writer processes, with reader processes listing orders alongside, and "
+            "report throughput, latency and lock errors. On SQLite the run is repeated with the pre-profile settings "
+            "for comparison.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--writers", type=int, default=8)
+        parser.add_argument("--readers", type=int, default=4, help="Processes listing orders while the writers run.")
+        parser.add_argument("--orders", type=int, default=100, help="Orders per writer.")
+        parser.add_argument("--products", type=int, default=20,
+                            help="Products the writers share; fewer means more row contention.")
+
+    def handle(self, *args, **options):
+        seller = Sellers.objects.create(name="bench", username=f"bench-{uuid.uuid4().hex}", password="!")
+        try:
+            product_ids = [p.id for p in Products.objects.bulk_create(
+                Products(seller=seller, name=f"bench-{i}", price=10, quantity=1_000_000, category="bench")
+                for i in range(options["products"]))]
+
+            profiles = [("current", None)]
+            if connection.vendor == "sqlite":
+                profiles = [("baseline", SQLITE_BASELINE), ("profile", None)]
+
+            self.stdout.write(f"{'profile':<10} {'orders/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} "
+                              f"{'ok':>6} {'locked':>7} {'reads/s':>8} {'read locked':>12}")
+            for label, override in profiles:
+                row = self.run_profile(seller, product_ids, override, options)
+                self.stdout.write(f"{label:<10} {row['throughput']:>9.1f} {row['p50']:>8.1f} {row['p95']:>8.1f} "
+                                  f"{row['max']:>8.1f} {row['ok']:>6} {row['locked']:>7} {row['reads']:>8.1f} "
+                                  f"{row['read_locked']:>12}")
+        finally:
+            connections.close_all()
+            Sellers.objects.filter(id=seller.id).delete()
+
+    def run_profile(self, seller, product_ids, override, options):
+        db_settings = connections.settings["default"]
+        original_options = db_settings.get("OPTIONS", {})
+        connections.close_all()
+        try:
+            if override is None:
+                return self.run_workload(seller, product_ids, options)
+
+            db_settings["OPTIONS"] = override["options"]
+            with override_settings(SQLITE_PRAGMAS=override["pragmas"]):
+                return self.run_workload(seller, product_ids, options)
+        finally:
+            db_settings["OPTIONS"] = original_options
+            connections.close_all()
+
+    def run_workload(self, seller, product_ids, options):
+        # Connect once so a journal mode switch happens before the workers start, then close again: forked
+        # workers must open their own connections, like separate gunicorn workers would.
+        connection.ensure_connection()
+        connection.close()
+
+        context = multiprocessing.get_context("fork")
+        results = context.Queue()
+        done = context.Event()
+        readers = [context.Process(target=read_orders, args=(seller, done, results))
+                   for _ in range(options["readers"])]
+        writers = [context.Process(target=write_orders, args=(seller, product_ids, index, options["orders"], results))
+                   for index in range(options["writers"])]
+
+        for process in readers:
+            process.start()
+        start = time.perf_counter()
+        for process in writers:
+            process.start()
+
+        write_results = [results.get() for _ in writers]
+        elapsed = time.perf_counter() - start
+        done.set()
+        read_results = [results.get() for _ in readers]
+        for process in readers + writers:
+            process.join()
+
+        latencies = sorted(latency for result in write_results for latency in result["latencies"])
+        return {"throughput": sum(result["ok"] for result in write_results) / elapsed,
+                "p50": latencies[len(latencies) // 2] * 1000,
+                "p95": latencies[int(len(latencies) * 0.95)] * 1000,
+                "max": latencies[-1] * 1000,
+                "ok": sum(result["ok"] for result in write_results),
+                "locked": sum(result["locked"] for result in write_results),
+                "reads": sum(result["reads"] for result in read_results) / elapsed,
+                "read_locked": sum(result["locked"] for result in read_results)}
+
+
+def write_orders(seller, product_ids, index, orders, results):
+    latencies, ok, locked = [], 0, 0
+    try:
+        for n in range(orders):
+            items = [{"product_id": product_ids[(index + n + k) % len(product_ids)], "quantity": 1}
+                     for k in range(3)]
+            start = time.perf_counter()
+            try:
+                create_order(seller=seller, order_type="OUTGOING" if n % 2 else "INCOMING", items=items)
+                ok += 1
+            except OperationalError:
+                locked += 1
+            latencies.append(time.perf_counter() - start)
+    finally:
+        connection.close()
+        results.put({"latencies": latencies, "ok": ok, "locked": locked})
+
+
+def read_orders(seller, done, results):
+    reads, locked = 0, 0
+    try:
+        while not done.is_set():
+            try:
+                list(get_orders_for_seller(seller).order_by("-timestamp", "-id")[:50])
+                reads += 1
+            except OperationalError:
+                locked += 1
+    finally:
+        connection.close()
+        results.put({"reads": reads, "locked": locked})
@@ -0,0 +1,73 @@
+import datetime
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from core.renderers import FastJSONRenderer
+from core.utils import serialize_product
+from orders.models import Orders, OrderItems
+from orders.serializers import OrderSerializer
+from products.models import Products
+
+
+class Command(BaseCommand):
+    help = "Compare DRF's JSONRenderer with FastJSONRenderer on large product and order list envelopes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--items", type=int, default=10000, help="Products/orders per payload.")
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        payloads = [("products", self.product_payload(options["items"])),
+                    ("orders", self.order_payload(options["items"]))]
+
+        self.stdout.write(f"{'payload':<10} {'bytes':>10} {'drf ms':>9} {'fast ms':>9} {'speedup':>8}")
+        for label, payload in payloads:
+            expected = JSONRenderer().render(payload)
+            if FastJSONRenderer().render(payload) != expected:
+                raise AssertionError(f"FastJSONRenderer output differs from JSONRenderer for {label}")
+
+            drf = self.time(JSONRenderer(), payload, options["repeat"])
+            fast = self.time(FastJSONRenderer(), payload, options["repeat"])
+            self.stdout.write(f"{label:<10} {len(expected):>10} {drf * 1000:>9.1f} {fast * 1000:>9.1f} "
+                              f"{drf / fast:>7.1f}x")
+
+    def product_payload(self, count):
+        today = datetime.date.today()
+        products = [Products(id=i, name=f"Product {i} – ünïcode", price=Decimal(f"{i % 1000}.{i % 100:02d}"),
+                             quantity=i % 500, category=f"category-{i % 20}",
+                             expiry=today + datetime.timedelta(days=i % 365) if i % 3 else None,
+                             image=f"products/{i}.jpg" if i % 2 else None,
+                             image_variants={"small": f"products/{i}_small.jpg"} if i % 4 == 1 else {})
+                    for i in range(1, count + 1)]
+        return {"success": True,
+                "msg": "Products fetched successfully",
+                "data": {"products": [serialize_product(p) for p in products], "next_cursor": None}}
+
+    def order_payload(self, count):
+        now = timezone.now()
+        products = [Products(id=i, name=f"Product {i}", price=Decimal(i)) for i in range(1, 6)]
+        orders = []
+        for i in range(1, count + 1):
+            order = Orders(id=i, order_type="OUTGOING", total_price=Decimal("50.00"),
+                           timestamp=now - datetime.timedelta(seconds=i, microseconds=i))
+            items = [OrderItems(id=i * 10 + n, order=order, product=product, quantity=2,
+                                price_at_time=product.price, total=product.price * 2)
+                     for n, product in enumerate(products)]
+            order._prefetched_objects_cache = {"items": items}
+            orders.append(order)
+        return {"success": True,
+                "msg": "Orders fetched successfully",
+                "data": {"orders": OrderSerializer(orders, many=True).data, "next_cursor": None}}
+
+    def time(self, renderer, payload, repeat):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            renderer.render(payload)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best
@@ -0,0 +1,308 @@
+import datetime
+import itertools
+import random
+import time
+from array import array
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+
+from orders.models import Orders, OrderItems, SalesRollup
+from products.models import Products, InventorySummary, ProductTrigram, StockSnapshot
+from users.models import Sellers
+
+ADJECTIVES = ["Organic", "Premium", "Classic", "Fresh", "Compact", "Deluxe", "Eco", "Smart", "Mini", "Ultra",
+              "Vintage", "Rapid", "Golden", "Silent", "Heavy", "Light", "Crystal", "Rustic", "Modern", "Wild"]
+NOUNS = ["Coffee", "Tea", "Rice", "Soap", "Shampoo", "Notebook", "Pen", "Charger", "Cable", "Bottle", "Towel",
+         "Lamp", "Chair", "Mug", "Backpack", "Headphones", "Keyboard", "Mouse", "Candle", "Blanket", "Honey",
+         "Pasta", "Olive Oil", "Detergent", "Sneakers", "Jacket", "Wallet", "Speaker", "Kettle", "Blender"]
+CATEGORIES = ["grocery", "beverages", "personal care", "stationery", "electronics", "home", "furniture",
+              "kitchen", "apparel", "accessories", "outdoor", "toys"]
+
+# Relative order volume per hour of day (UTC): quiet nights, a late-morning peak and an evening peak.
+HOUR_WEIGHTS = [2, 1, 1, 1, 1, 2, 4, 7, 10, 13, 15, 16, 15, 14, 13, 12, 12, 13, 15, 16, 13, 9, 6, 3]
+ITEM_COUNT_WEIGHTS = [45, 25, 15, 9, 6]
+
+
+class Command(BaseCommand):
+    help = ("Deterministically generate sellers, products, orders and order items with skewed popularity and a "
+            "realistic timestamp spread, using multi-row INSERTs.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sellers", type=int, default=1000)
+        parser.add_argument("--products", type=int, default=100_000)
+        parser.add_argument("--orders", type=int, default=200_000)
+        parser.add_argument("--max-items", type=int, default=5, help="Maximum line items per order.")
+        parser.add_argument("--days", type=int, default=365, help="Orders are spread over this many days.")
+        parser.add_argument("--end", help="Last day of the order history (YYYY-MM-DD), defaults to today.")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--prefix", default="synthetic", help="Username prefix for generated sellers.")
+        parser.add_argument("--batch-size", type=int, default=50_000, help="Rows per transaction.")
+        parser.add_argument("--search-index", action="store_true",
+                            help="Also write product search trigrams (about 15 rows per product).")
+        parser.add_argument("--skip-derived", action="store_true",
+                            help="Don't write sales rollups or rebuild inventory summaries.")
+
+    def handle(self, *args, **options):
+        if options["sellers"] <= 0 or options["products"] < options["sellers"]:
+            raise CommandError("Need at least one seller and at least one product per seller.")
+        if not 1 <= options["max_items"] <= len(ITEM_COUNT_WEIGHTS):
+            raise CommandError(f"--max-items must be between 1 and {len(ITEM_COUNT_WEIGHTS)}.")
+
+        prefix = f"{options['prefix']}-{options['seed']}-"
+        if Sellers.objects.filter(username__startswith=prefix).exists():
+            raise CommandError(f"Sellers with the username prefix {prefix!r} already exist; use another --prefix.")
+
+        try:
+            end = (datetime.date.fromisoformat(options["end"]) if options["end"]
+                   else datetime.datetime.now(datetime.timezone.utc).date())
+        except ValueError:
+            raise CommandError("--end must be in YYYY-MM-DD format")
+
+        self.rnd = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        self.ops = connection.ops
+        connection.ensure_connection()
+        started = time.perf_counter()
+
+        seller_ids = self.generate_sellers(options["sellers"], prefix)
+        products = self.generate_products(seller_ids, options["products"], options["search_index"], end)
+        self.generate_orders(seller_ids, products, options["orders"], options["max_items"], options["days"], end,
+                             rollups=not options["skip_derived"])
+        self.reset_sequences()
+
+        if not options["skip_derived"]:
+            step = time.perf_counter()
+            InventorySummary.rebuild(seller_ids=seller_ids)
+            self.stdout.write(f"Rebuilt inventory summaries in {time.perf_counter() - step:.1f}s")
+
+        self.stdout.write(self.style.SUCCESS(f"Dataset generated in {time.perf_counter() - started:.1f}s"))
+
+    def generate_sellers(self, count, prefix):
+        step = time.perf_counter()
+        # Hashing once keeps generation fast; every generated seller logs in with password "password".
+        password = make_password("password")
+        first_id = self.next_id(Sellers)
+        rows = [(first_id + i, f"Seller {i}", f"{prefix}{i}", password, False) for i in range(count)]
+        with transaction.atomic():
+            self.insert(Sellers, ["id", "name", "username", "password", "is_deleted"], rows)
+        self.report("sellers", count, step)
+        return [row[0] for row in rows]
+
+    def generate_products(self, seller_ids, count, search_index, end):
+        step = time.perf_counter()
+        rnd = self.rnd
+        # Pareto-like catalogue sizes: a few sellers own most of the products.
+        seller_weights = list(itertools.accumulate(1 / (rank + 1) ** 0.8 for rank in range(len(seller_ids))))
+        per_seller = [1] * len(seller_ids)
+        for index in rnd.choices(range(len(seller_ids)), cum_weights=seller_weights, k=count - len(seller_ids)):
+            per_seller[index] += 1
+
+        first_id = self.next_id(Products)
+        variants = Products._meta.get_field("image_variants").get_db_prep_save({}, connection)
+        prices = array("q")
+        columns = ["id", "seller_id", "name", "price", "quantity", "expiry", "category", "image",
+                   "image_variants", "version", "is_deleted"]
+        trigram_columns = ["seller_id", "product_id", "trigram"]
+        # The generated quantities have no ledger movements behind them, so each product gets an opening snapshot.
+        snapshot_columns = ["seller_id", "product_id", "quantity", "taken_at"]
+        opened_at = self.ops.adapt_datetimefield_value(
+            datetime.datetime.combine(end, datetime.time.min, tzinfo=datetime.timezone.utc))
+        trigram_cache = {}
+        ranges = []
+        rows, trigrams, snapshots = [], [], []
+        product_id = first_id
+
+        for seller_id, product_count in zip(seller_ids, per_seller):
+            ranges.append((product_id, product_count))
+            categories = rnd.sample(CATEGORIES, rnd.randint(1, 4))
+            for _ in range(product_count):
+                name = f"{rnd.choice(ADJECTIVES)} {rnd.choice(NOUNS)} {rnd.randint(1, 999)}"
+                category = rnd.choice(categories)
+                cents = int(rnd.lognormvariate(7, 1.1)) + 99
+                prices.append(cents)
+                expiry = None
+                if category in ("grocery", "beverages") or rnd.random() < 0.05:
+                    expiry = self.ops.adapt_datefield_value(end + datetime.timedelta(days=rnd.randint(-30, 720)))
+                # Heavy-tailed stock levels: many SKUs are low or out of stock, a few are stocked deep.
+                quantity = min(int((rnd.paretovariate(1.2) - 1) * 40), 5000)
+                rows.append((product_id, seller_id, name, self.money(cents), quantity, expiry, category, None,
+                             variants, 1, False))
+                snapshots.append((seller_id, product_id, quantity, opened_at))
+
+                if search_index:
+                    key = (name, category)
+                    if key not in trigram_cache:
+                        trigram_cache[key] = ProductTrigram.extract(f"{name} {category}")
+                    trigrams.extend((seller_id, product_id, trigram) for trigram in trigram_cache[key])
+
+                product_id += 1
+                if len(rows) >= self.batch_size:
+                    with transaction.atomic():
+                        self.insert(Products, columns, rows)
+                        self.insert(ProductTrigram, trigram_columns, trigrams)
+                        self.insert(StockSnapshot, snapshot_columns, snapshots)
+                    rows, trigrams, snapshots = [], [], []
+
+        with transaction.atomic():
+            self.insert(Products, columns, rows)
+            self.insert(ProductTrigram, trigram_columns, trigrams)
+            self.insert(StockSnapshot, snapshot_columns, snapshots)
+        self.report("products", count, step)
+        return {"first_id": first_id, "prices": prices, "ranges": ranges}
+
+    def generate_orders(self, seller_ids, products, count, max_items, days, end, rollups):
+        step = time.perf_counter()
+        rnd = self.rnd
+        first_id = products["first_id"]
+        prices = products["prices"]
+        ranges = products["ranges"]
+        seller_indexes = range(len(ranges))
+        item_counts = range(1, max_items + 1)
+
+        # Busier sellers (bigger catalogues) get proportionally more orders.
+        seller_weights = list(itertools.accumulate(product_count for _, product_count in ranges))
+        hour_weights = list(itertools.accumulate(HOUR_WEIGHTS))
+        item_weights = list(itertools.accumulate(ITEM_COUNT_WEIGHTS[:max_items]))
+
+        # Volume grows over the period and drops at weekends.
+        start = end - datetime.timedelta(days=days - 1)
+        day_weights = [(1 + day / days) * (0.7 if (start + datetime.timedelta(days=day)).weekday() >= 5 else 1)
+                       for day in range(days)]
+        total_weight = sum(day_weights)
+
+        order_id = self.next_id(Orders)
+        item_id = self.next_id(OrderItems)
+        order_columns = ["id", "seller_id", "order_type", "total_price", "timestamp"]
+        item_columns = ["id", "order_id", "product_id", "quantity", "price_at_time", "total"]
+        rollup_columns = ["granularity", "bucket", "seller_id", "product_id", "order_type", "quantity", "revenue"]
+        orders, items, rollup_rows = [], [], []
+        generated, item_count, rollup_count, cumulative = 0, 0, 0, 0.0
+
+        for day, weight in enumerate(day_weights):
+            cumulative += weight
+            day_count = round(count * cumulative / total_weight) - generated
+            generated += day_count
+            midnight = datetime.datetime.combine(start + datetime.timedelta(days=day), datetime.time(),
+                                                 tzinfo=datetime.timezone.utc)
+            # Orders are generated in time order so ids increase with timestamps, as they would in production.
+            seconds = sorted(hour * 3600 + rnd.random() * 3600
+                             for hour in rnd.choices(range(24), cum_weights=hour_weights, k=day_count))
+            # A day's orders only touch that day's hour and day buckets, so its rollups are complete at day end.
+            day_totals = {}
+
+            for second in seconds:
+                timestamp = midnight + datetime.timedelta(seconds=second)
+                seller_index = rnd.choices(seller_indexes, cum_weights=seller_weights)[0]
+                seller_id = seller_ids[seller_index]
+                product_start, product_count = ranges[seller_index]
+                order_type = "OUTGOING" if rnd.random() < 0.75 else "INCOMING"
+
+                # Zipf-like popularity inside a catalogue: rank r is picked with probability ~ 1/r.
+                wanted = min(rnd.choices(item_counts, cum_weights=item_weights)[0], product_count)
+                picked = set()
+                while len(picked) < wanted:
+                    picked.add(product_start + int(product_count ** rnd.random()) - 1)
+
+                total = 0
+                for product_id in sorted(picked):
+                    quantity = rnd.randint(1, 3) if order_type == "OUTGOING" else rnd.randint(10, 100)
+                    price = prices[product_id - first_id]
+                    total += price * quantity
+                    items.append((item_id, order_id, product_id, quantity, self.money(price),
+                                  self.money(price * quantity)))
+                    item_id += 1
+
+                    if rollups:
+                        key = (int(second // 3600), seller_id, product_id, order_type)
+                        units, cents = day_totals.get(key, (0, 0))
+                        day_totals[key] = (units + quantity, cents + price * quantity)
+
+                orders.append((order_id, seller_id, order_type, self.money(total),
+                               self.ops.adapt_datetimefield_value(timestamp)))
+                order_id += 1
+
+                if len(items) >= self.batch_size:
+                    item_count += len(items)
+                    self.flush_orders(order_columns, orders, item_columns, items, rollup_columns, rollup_rows)
+                    orders, items, rollup_rows = [], [], []
+
+            if rollups:
+                rows = self.rollup_rows(midnight, day_totals)
+                rollup_count += len(rows)
+                rollup_rows.extend(rows)
+
+        item_count += len(items)
+        self.flush_orders(order_columns, orders, item_columns, items, rollup_columns, rollup_rows)
+        self.report("orders", count, step)
+        self.report("order items", item_count, step)
+        if rollups:
+            self.report("rollups", rollup_count, step)
+
+    def rollup_rows(self, midnight, day_totals):
+        days = {}
+        for (_, seller_id, product_id, order_type), (units, cents) in day_totals.items():
+            units_so_far, cents_so_far = days.get((seller_id, product_id, order_type), (0, 0))
+            days[(seller_id, product_id, order_type)] = (units_so_far + units, cents_so_far + cents)
+
+        adapt = self.ops.adapt_datetimefield_value
+        hour_buckets = [adapt(midnight + datetime.timedelta(hours=hour)) for hour in range(24)]
+        return ([("hour", hour_buckets[hour], seller_id, product_id, order_type, units, self.money(cents))
+                 for (hour, seller_id, product_id, order_type), (units, cents) in sorted(day_totals.items())] +
+                [("day", hour_buckets[0], seller_id, product_id, order_type, units, self.money(cents))
+                 for (seller_id, product_id, order_type), (units, cents) in sorted(days.items())])
+
+    def flush_orders(self, order_columns, orders, item_columns, items, rollup_columns, rollup_rows):
+        with transaction.atomic():
+            self.insert(Orders, order_columns, orders)
+            self.insert(OrderItems, item_columns, items)
+            self.insert(SalesRollup, rollup_columns, rollup_rows)
+
+    def insert(self, model, columns, rows):
+        if not rows:
+            return
+
+        quote_name = self.ops.quote_name
+        table = quote_name(model._meta.db_table)
+        column_list = ", ".join(quote_name(column) for column in columns)
+        placeholder = f"({', '.join(['%s'] * len(columns))})"
+        max_params = connection.features.max_query_params or 65535
+        per_statement = max(1, min(1000, max_params // len(columns)))
+
+        # A raw backend cursor skips DEBUG query logging, which would otherwise format every huge statement.
+        cursor = connection.create_cursor()
+        try:
+            full_sql = None
+            for offset in range(0, len(rows), per_statement):
+                chunk = rows[offset:offset + per_statement]
+                if len(chunk) == per_statement and full_sql:
+                    sql = full_sql
+                else:
+                    sql = f"INSERT INTO {table} ({column_list}) VALUES {', '.join([placeholder] * len(chunk))}"
+                    if len(chunk) == per_statement:
+                        full_sql = sql
+                cursor.execute(sql, [value for row in chunk for value in row])
+        finally:
+            cursor.close()
+
+    def next_id(self, model):
+        return (model.objects.aggregate(last=Max("id"))["last"] or 0) + 1
+
+    def reset_sequences(self):
+        # Rows were inserted with explicit ids; move PostgreSQL sequences past them (no-op on SQLite).
+        statements = self.ops.sequence_reset_sql(no_style(), [Sellers, Products, ProductTrigram, Orders,
+                                                                    OrderItems])
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+    def money(self, cents):
+        return self.ops.adapt_decimalfield_value(Decimal(cents).scaleb(-2), 20, 2)
+
+    def report(self, label, count, started):
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f"{label:<12} {count:>12,} rows in {elapsed:>7.1f}s ({count / max(elapsed, 1e-9):,.0f}/s)")
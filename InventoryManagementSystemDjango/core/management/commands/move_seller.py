@@ -0,0 +1,104 @@
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.db.models import Max
+
+from core.models import SellerShard
+from core.routers import SHARD_ID_BLOCK, SHARDED_MODELS, copy_seller_to_shard, get_shard, invalidate_shard
+from users.models import Sellers
+
+
+class Command(BaseCommand):
+    help = ("Move a seller's products, orders and derived tables to another shard. Writes for the seller are "
+            "refused while the rows are copied; reads keep using the old shard until the move is complete.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("seller_id", type=int)
+        parser.add_argument("shard", help="Target database alias, one of SHARD_DATABASES.")
+        parser.add_argument("--batch-size", type=int, default=2000)
+        parser.add_argument("--no-wait", action="store_true",
+                            help="Skip waiting SHARD_CACHE_TTL for workers to see the lock. Only safe when no "
+                                 "other process is serving the seller.")
+
+    def handle(self, *args, **options):
+        shards = getattr(settings, "SHARD_DATABASES", ["default"])
+        target = options["shard"]
+        if target not in shards:
+            raise CommandError(f"Unknown shard {target!r}, expected one of {', '.join(shards)}")
+
+        try:
+            seller = Sellers.objects.using("default").get(id=options["seller_id"])
+        except Sellers.DoesNotExist:
+            raise CommandError(f"Seller {options['seller_id']} does not exist")
+
+        source, locked = get_shard(seller.id)
+        if locked:
+            raise CommandError(f"Seller {seller.id} is already being moved; clear SellerShard.locked if a "
+                               f"previous move failed")
+        if source == target:
+            self.stdout.write(f"Seller {seller.id} is already on {target}.")
+            return
+
+        self.check_target_ids(seller, source, target, shards)
+
+        self.set_shard(seller, source, locked=True, wait=not options["no_wait"])
+        try:
+            copy_seller_to_shard(seller, target)
+            with transaction.atomic(using=target):
+                copied = self.copy_rows(seller, source, target, options["batch_size"])
+        except Exception:
+            self.set_shard(seller, source, locked=False, wait=False)
+            raise
+
+        # Give workers that cached the old alias time to pick up the new one before the source rows disappear.
+        self.set_shard(seller, target, locked=False, wait=not options["no_wait"])
+        with transaction.atomic(using=source):
+            for model, lookup in reversed(self.sharded_models()):
+                model.objects.using(source).filter(**{lookup: seller.id}).delete()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Moved seller {seller.id} from {source} to {target}: "
+            + ", ".join(f"{count} {label}" for label, count in copied.items())))
+
+    def sharded_models(self):
+        return [(apps.get_model(label), lookup) for label, lookup in SHARDED_MODELS.items()]
+
+    def check_target_ids(self, seller, source, target, shards):
+        # Only PostgreSQL sequences ignore explicit ids. Elsewhere (SQLite) the next id follows the largest id in
+        # the table, so copying rows from a later block would move the target's numbering into another shard's.
+        if connections[target].vendor == "postgresql":
+            return
+
+        limit = (shards.index(target) + 1) * SHARD_ID_BLOCK
+        for model, lookup in self.sharded_models():
+            highest = model.objects.using(source).filter(**{lookup: seller.id}).aggregate(id=Max("pk"))["id"]
+            if highest is not None and highest >= limit:
+                raise CommandError(f"Seller {seller.id} has {model.__name__} ids beyond the id block of {target}; "
+                                   f"on {connections[target].vendor} it can only move to a shard at or after "
+                                   f"the one that numbered its rows")
+
+    def set_shard(self, seller, alias, locked, wait):
+        SellerShard.objects.using("default").update_or_create(seller_id=seller.id,
+                                                              defaults={"alias": alias, "locked": locked})
+        invalidate_shard(seller.id)
+        if wait:
+            time.sleep(getattr(settings, "SHARD_CACHE_TTL", 5))
+
+    def copy_rows(self, seller, source, target, batch_size):
+        copied = {}
+        for model, lookup in self.sharded_models():
+            rows = model.objects.using(source).filter(**{lookup: seller.id}).order_by("pk")
+            count = 0
+            batch = []
+            for row in rows.iterator(chunk_size=batch_size):
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    model.objects.using(target).bulk_create(batch)
+                    count += len(batch)
+                    batch = []
+            model.objects.using(target).bulk_create(batch)
+            copied[model.__name__] = count + len(batch)
+        return copied
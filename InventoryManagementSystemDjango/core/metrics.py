@@ -0,0 +1,46 @@
+import os
+
+from django.db import transaction
+from prometheus_client import CollectorRegistry, Counter, Histogram, REGISTRY, generate_latest, multiprocess
+
+from core.routers import current_shard
+
+# With PROMETHEUS_MULTIPROC_DIR set before startup, prometheus_client keeps every value in mmap files in that
+# directory, one per process. /metrics then merges the files, so any worker can answer for all of them.
+REQUEST_LATENCY = Histogram("http_request_duration_seconds",
+                            "Request latency by view and method.",
+                            ["view", "method"],
+                            buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10))
+REQUESTS = Counter("http_requests_total",
+                   "Requests by view, method and response status.",
+                   ["view", "method", "status"])
+ORDERS_CREATED = Counter("orders_created_total",
+                         "Committed orders by order type.",
+                         ["order_type"])
+ORDER_LINES_PROCESSED = Counter("order_lines_processed_total",
+                                "Committed order lines by order type.",
+                                ["order_type"])
+STOCK_REJECTIONS = Counter("stock_rejections_total",
+                           "Outgoing orders rejected for insufficient stock.")
+
+
+def record_request(view, method, status, duration):
+    REQUEST_LATENCY.labels(view, method).observe(duration)
+    REQUESTS.labels(view, method, str(status)).inc()
+
+
+def record_order(order_type, lines):
+    # Only count work that is actually committed; batch orders roll back together with their counters.
+    def record():
+        ORDERS_CREATED.labels(order_type).inc()
+        ORDER_LINES_PROCESSED.labels(order_type).inc(lines)
+
+    transaction.on_commit(record, using=current_shard())
+
+
+def render_metrics():
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
@@ -0,0 +1,274 @@
+import logging
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from rest_framework import status
+
+from core.metrics import record_request
+from core.routers import use_replicas, reset_replicas, pin_to_primary, is_pinned_to_primary, apin_to_primary, \
+    ais_pinned_to_primary, get_shard, aget_shard, use_shard, reset_shard
+from core.utils import dump_json, get_user_id_from_request, json_error_response
+
+logger = logging.getLogger(__name__)
+
+
+class QueryStats:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.patterns = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            # Django passes the SQL with placeholders and the values separately, so the SQL text is the pattern.
+            self.patterns[sql] += 1
+
+    def duplicates(self):
+        return sum(count - 1 for count in self.patterns.values())
+
+    def most_repeated(self):
+        if not self.patterns:
+            return (None, 0)
+        return self.patterns.most_common(1)[0]
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Counts the SQL queries each request runs, with their total time and repeated query patterns. The numbers go
+    into a Server-Timing header and a structured "core.middleware" log line. A warning is logged when one query
+    pattern repeats N_PLUS_ONE_THRESHOLD times or more. Queries run while a streaming response is consumed
+    happen after the middleware returns and are not counted.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        stats = QueryStats()
+        start = time.perf_counter()
+        with self.instrument(stats):
+            response = self.get_response(request)
+        return self.finish(request, response, stats, start)
+
+    async def __acall__(self, request):
+        stats = QueryStats()
+        start = time.perf_counter()
+        # Connections are per thread, and under ASGI the ORM runs in the request's thread-sensitive worker
+        # thread, for sync views and async ORM calls alike. Install the wrappers there, not on the event loop.
+        stack = await sync_to_async(self.instrument, thread_sensitive=True)(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close, thread_sensitive=True)()
+        return self.finish(request, response, stats, start)
+
+    def instrument(self, stats):
+        """Install ``stats`` on the calling thread's connections; closing the returned stack removes it."""
+        stack = ExitStack()
+        # Every alias, so queries sent to a replica or a shard are counted too.
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(stats))
+        return stack
+
+    def finish(self, request, response, stats, start):
+        total_ms = (time.perf_counter() - start) * 1000
+        db_ms = stats.duration * 1000
+
+        response["Server-Timing"] = (f'db;dur={db_ms:.2f};desc="{stats.count} queries", '
+                                     f'app;dur={max(total_ms - db_ms, 0):.2f}, total;dur={total_ms:.2f}')
+
+        pattern, repeats = stats.most_repeated()
+        record = {"method": request.method,
+                  "path": request.path,
+                  "view": self.view_name(request),
+                  "status": response.status_code,
+                  "duration_ms": round(total_ms, 2),
+                  "db_ms": round(db_ms, 2),
+                  "queries": stats.count,
+                  "duplicate_queries": stats.duplicates()}
+
+        threshold = getattr(settings, "N_PLUS_ONE_THRESHOLD", 10)
+        if threshold and repeats >= threshold:
+            logger.warning(dump_json({**record, "event": "n_plus_one", "repeats": repeats, "sql": pattern[:500]}))
+        else:
+            logger.info(dump_json({**record, "event": "request"}))
+
+        return response
+
+    def view_name(self, request):
+        match = getattr(request, "resolver_match", None)
+        if not match:
+            return None
+        func = getattr(match.func, "view_class", match.func)
+        return f"{func.__module__}.{func.__name__}"
+
+
+class MetricsMiddleware:
+    """Records request latency and status per view class and method, e.g. ProductListView.get."""
+
+    METHODS = {"GET", "POST", "PUT", "PATCH", "DELETE", "HEAD", "OPTIONS"}
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        start = time.perf_counter()
+        response = self.get_response(request)
+        return self.record(request, response, start)
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        response = await self.get_response(request)
+        return self.record(request, response, start)
+
+    def record(self, request, response, start):
+        method = request.method if request.method in self.METHODS else "OTHER"
+        record_request(view=self.view_label(request, method),
+                       method=method,
+                       status=response.status_code,
+                       duration=time.perf_counter() - start)
+        return response
+
+    def view_label(self, request, method):
+        match = getattr(request, "resolver_match", None)
+        if not match:
+            return "unmatched"
+        func = getattr(match.func, "view_class", None) or match.func
+        return f"{func.__name__}.{method.lower()}"
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Lets ReplicaRouter send the reads of GET/HEAD/OPTIONS requests to a replica. Any other method pins the
+    seller to the primary for READ_YOUR_WRITES_SECONDS, so their next reads see what they just wrote.
+    """
+
+    SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        if not getattr(settings, "REPLICA_DATABASES", None):
+            return self.get_response(request)
+
+        seller_id, _ = get_user_id_from_request(request)
+        safe = request.method in self.SAFE_METHODS
+        token = use_replicas(safe and not (seller_id and is_pinned_to_primary(seller_id)))
+        try:
+            response = self.get_response(request)
+        finally:
+            reset_replicas(token)
+
+        if not safe and seller_id:
+            pin_to_primary(seller_id)
+        return response
+
+    async def __acall__(self, request):
+        if not getattr(settings, "REPLICA_DATABASES", None):
+            return await self.get_response(request)
+
+        seller_id, _ = get_user_id_from_request(request)
+        safe = request.method in self.SAFE_METHODS
+        # The ORM runs async queries in a worker thread that inherits this context, so the flag reaches the router.
+        token = use_replicas(safe and not (seller_id and await ais_pinned_to_primary(seller_id)))
+        try:
+            response = await self.get_response(request)
+        finally:
+            reset_replicas(token)
+
+        if not safe and seller_id:
+            await apin_to_primary(seller_id)
+        return response
+
+
+class ShardRoutingMiddleware:
+    """
+    Points ShardRouter at the authenticated seller's shard for the whole request. While move_seller is copying
+    the seller, reads are still served from the old shard and anything else gets a 503.
+    """
+
+    SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        seller_id = self.seller_id(request)
+        if not seller_id:
+            return self.get_response(request)
+
+        alias, locked = get_shard(seller_id)
+        if locked and request.method not in self.SAFE_METHODS:
+            return self.moving_response()
+
+        token = use_shard(alias)
+        try:
+            return self.get_response(request)
+        finally:
+            reset_shard(token)
+
+    async def __acall__(self, request):
+        seller_id = self.seller_id(request)
+        if not seller_id:
+            return await self.get_response(request)
+
+        alias, locked = await aget_shard(seller_id)
+        if locked and request.method not in self.SAFE_METHODS:
+            return self.moving_response()
+
+        token = use_shard(alias)
+        try:
+            return await self.get_response(request)
+        finally:
+            reset_shard(token)
+
+    def seller_id(self, request):
+        if len(getattr(settings, "SHARD_DATABASES", [])) < 2:
+            return None
+        seller_id, _ = get_user_id_from_request(request)
+        return seller_id
+
+    def moving_response(self):
+        response = json_error_response(msg="Seller data is being moved, please retry shortly",
+                                       status_code=status.HTTP_503_SERVICE_UNAVAILABLE)
+        response["Retry-After"] = str(getattr(settings, "SHARD_CACHE_TTL", 5))
+        return response
@@ -0,0 +1,28 @@
+# Generated by Django 6.0.2 on 2026-10-18 17:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('users', '0003_remove_sellers_is_active_sellers_is_deleted'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResourceVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resource', models.CharField(choices=[('products', 'Products'), ('orders', 'Orders')], max_length=20)),
+                ('version', models.BigIntegerField(default=0)),
+                ('seller', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='users.sellers')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('seller', 'resource'), name='resource_version_unique')],
+            },
+        ),
+    ]
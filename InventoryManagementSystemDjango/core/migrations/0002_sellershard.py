@@ -0,0 +1,23 @@
+# Generated by Django 6.0.2 on 2026-10-18 17:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+        ('users', '0003_remove_sellers_is_active_sellers_is_deleted'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SellerShard',
+            fields=[
+                ('seller', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to='users.sellers')),
+                ('alias', models.CharField(max_length=64)),
+                ('locked', models.BooleanField(default=False)),
+            ],
+        ),
+    ]
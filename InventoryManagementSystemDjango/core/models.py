@@ -0,0 +1,44 @@
+from django.db import models, connections, router
+
+from users.models import Sellers
+
+
+class ResourceVersion(models.Model):
+    RESOURCE_CHOICES = (
+        ("products", "Products"),
+        ("orders", "Orders"))
+
+    seller = models.ForeignKey(Sellers, on_delete=models.CASCADE, related_name="+")
+    resource = models.CharField(max_length=20, choices=RESOURCE_CHOICES)
+    version = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["seller", "resource"], name="resource_version_unique"),
+        ]
+
+    @classmethod
+    def bump(cls, seller_id, *resources):
+        connection = connections[router.db_for_write(cls)]
+        table = connection.ops.quote_name(cls._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} (seller_id, resource, version) VALUES "
+                f"{', '.join(['(%s, %s, 1)'] * len(resources))} "
+                f"ON CONFLICT (seller_id, resource) DO UPDATE SET version = {table}.version + 1",
+                [value for resource in resources for value in (seller_id, resource)])
+
+    @classmethod
+    def get(cls, seller_id, *resources):
+        versions = dict(cls.objects.filter(seller_id=seller_id, resource__in=resources)
+                        .values_list("resource", "version"))
+        return [versions.get(resource, 0) for resource in resources]
+
+
+class SellerShard(models.Model):
+    """Which database holds a seller's products and orders. Sellers without a row live on "default"."""
+
+    seller = models.OneToOneField(Sellers, on_delete=models.CASCADE, primary_key=True, related_name="+")
+    alias = models.CharField(max_length=64)
+    # Set while move_seller copies the seller to another shard; writes are refused until the move finishes.
+    locked = models.BooleanField(default=False)
@@ -0,0 +1,55 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password
+
+_executor = None
+_slots = None
+_executor_lock = threading.Lock()
+
+
+class PasswordPoolBusy(Exception):
+    pass
+
+
+def get_executor():
+    global _executor, _slots
+    with _executor_lock:
+        if _executor is None:
+            workers = getattr(settings, "PASSWORD_WORKERS", 4)
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-worker")
+            _slots = threading.BoundedSemaphore(workers + getattr(settings, "PASSWORD_QUEUE_SIZE", 0))
+        return _executor, _slots
+
+
+def submit_check_password(password, encoded):
+    # Each verification holds a slot until the hash finishes, so at most PASSWORD_WORKERS + PASSWORD_QUEUE_SIZE
+    # logins are ever hashing or waiting. Anything beyond that is rejected immediately instead of tying up a
+    # request thread.
+    executor, slots = get_executor()
+    if not slots.acquire(blocking=False):
+        raise PasswordPoolBusy("Too many login attempts in progress, try again shortly")
+
+    try:
+        return executor.submit(_check_and_release, slots, password, encoded)
+    except Exception:
+        slots.release()
+        raise
+
+
+def _check_and_release(slots, password, encoded):
+    # Release before the future completes, so a caller that got its result can log in again straight away.
+    try:
+        return check_password(password, encoded)
+    finally:
+        slots.release()
+
+
+def verify_password(password, encoded):
+    return submit_check_password(password, encoded).result()
+
+
+async def averify_password(password, encoded):
+    return await asyncio.wrap_future(submit_check_password(password, encoded))
@@ -0,0 +1,42 @@
+import json
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# orjson writes datetimes as isoformat() and dates as YYYY-MM-DD natively. OPT_UTC_Z gives the same "Z" suffix
+# DRF uses for UTC. Anything orjson can't encode (Decimal, lazy strings, querysets, ...) falls back to DRF's
+# encoder, so the output decodes to the same JSON values as JSONRenderer's. The bytes can still differ: orjson
+# may spell float exponents differently (1e-7 where DRF writes 1e-07), and it writes NaN/Infinity as null where
+# DRF raises.
+ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS if orjson else 0
+
+_fallback_encoder = JSONEncoder()
+
+
+def dumps(data):
+    if orjson is None:
+        content = json.dumps(data, cls=JSONEncoder, ensure_ascii=False, separators=(",", ":")).encode()
+    else:
+        content = orjson.dumps(data, default=_fallback_encoder.default, option=ORJSON_OPTIONS)
+
+    # Like JSONRenderer, escape the two line terminators that are valid JSON but not valid JavaScript.
+    if b"\xe2\x80\xa8" in content or b"\xe2\x80\xa9" in content:
+        content = content.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
+    return content
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+
+        # orjson can only indent by two spaces; leave browsable/indented output to DRF.
+        if orjson is None or self.get_indent(accepted_media_type or "", renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        return dumps(data)
@@ -0,0 +1,221 @@
+import contextlib
+import contextvars
+import random
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connections
+
+from core.models import SellerShard
+from users.models import Sellers
+
+# Off by default: management commands, background workers and anything outside ReplicaRoutingMiddleware keep
+# reading from the primary.
+_read_from_replica = contextvars.ContextVar("read_from_replica", default=False)
+_replica_down_until = {}
+
+# Seller-owned models, in foreign key order, with the lookup that selects one seller's rows. ShardRouter keeps
+# them on the current seller's shard; everything else (sellers, the shard map) stays on "default".
+SHARDED_MODELS = {
+    "products.products": "seller_id",
+    "products.inventorysummary": "seller_id",
+    "products.producttrigram": "seller_id",
+    "orders.orders": "seller_id",
+    "orders.orderitems": "order__seller_id",
+    "orders.salesrollup": "seller_id",
+    "products.stockmovement": "seller_id",
+    "products.stocksnapshot": "seller_id",
+    "core.resourceversion": "seller_id",
+}
+
+# Each shard numbers its rows from alias index * SHARD_ID_BLOCK, so ids stay unique when a seller is moved. On
+# SQLite the next id follows the largest id in the table, so move_seller refuses to copy rows into a lower block.
+SHARD_ID_BLOCK = 2 ** 40
+
+# "default" outside ShardRoutingMiddleware; commands and background work pick a shard with seller_shard().
+_current_shard = contextvars.ContextVar("current_shard", default="default")
+
+
+def use_replicas(enabled):
+    return _read_from_replica.set(enabled)
+
+
+def reset_replicas(token):
+    _read_from_replica.reset(token)
+
+
+def pin_to_primary(seller_id):
+    cache.set(f"primary-pin:{seller_id}", True, getattr(settings, "READ_YOUR_WRITES_SECONDS", 5))
+
+
+def is_pinned_to_primary(seller_id):
+    return cache.get(f"primary-pin:{seller_id}", False)
+
+
+async def apin_to_primary(seller_id):
+    await cache.aset(f"primary-pin:{seller_id}", True, getattr(settings, "READ_YOUR_WRITES_SECONDS", 5))
+
+
+async def ais_pinned_to_primary(seller_id):
+    return await cache.aget(f"primary-pin:{seller_id}", False)
+
+
+def use_shard(alias):
+    return _current_shard.set(alias)
+
+
+def reset_shard(token):
+    _current_shard.reset(token)
+
+
+def current_shard():
+    return _current_shard.get()
+
+
+def is_sharded(model):
+    return model._meta.label_lower in SHARDED_MODELS
+
+
+def get_shard(seller_id):
+    """(alias, locked) for the seller, cached for SHARD_CACHE_TTL seconds."""
+    if len(getattr(settings, "SHARD_DATABASES", [])) < 2:
+        return ("default", False)
+
+    key = f"seller-shard:{seller_id}"
+    shard = cache.get(key)
+    if shard is None:
+        # Always the primary: a lagging replica could send the seller back to a shard they were moved off.
+        shard = (SellerShard.objects.using("default").filter(seller_id=seller_id)
+                 .values_list("alias", "locked").first()) or ("default", False)
+        cache.set(key, tuple(shard), getattr(settings, "SHARD_CACHE_TTL", 5))
+    return tuple(shard)
+
+
+async def aget_shard(seller_id):
+    if len(getattr(settings, "SHARD_DATABASES", [])) < 2:
+        return ("default", False)
+
+    key = f"seller-shard:{seller_id}"
+    shard = await cache.aget(key)
+    if shard is None:
+        shard = (await SellerShard.objects.using("default").filter(seller_id=seller_id)
+                 .values_list("alias", "locked").afirst()) or ("default", False)
+        await cache.aset(key, tuple(shard), getattr(settings, "SHARD_CACHE_TTL", 5))
+    return tuple(shard)
+
+
+def invalidate_shard(seller_id):
+    cache.delete(f"seller-shard:{seller_id}")
+
+
+@contextlib.contextmanager
+def seller_shard(seller_id):
+    token = use_shard(get_shard(seller_id)[0])
+    try:
+        yield
+    finally:
+        reset_shard(token)
+
+
+def copy_seller_to_shard(seller, alias):
+    # Shards only need the seller row to satisfy foreign keys, so the copy carries no usable password.
+    if alias != "default" and not Sellers.objects.using(alias).filter(id=seller.id).exists():
+        Sellers(id=seller.id, name=seller.name, username=seller.username, password="!",
+                is_deleted=seller.is_deleted).save(using=alias, force_insert=True)
+
+
+def assign_shard(seller):
+    shards = getattr(settings, "SHARD_DATABASES", [])
+    if len(shards) < 2:
+        return "default"
+
+    alias = shards[seller.id % len(shards)]
+    copy_seller_to_shard(seller, alias)
+    SellerShard.objects.using("default").create(seller_id=seller.id, alias=alias)
+    invalidate_shard(seller.id)
+    return alias
+
+
+def reserve_shard_ids(sender, using, **kwargs):
+    """post_migrate handler: start each seller-owned table of a shard at its own block of ids."""
+    shards = getattr(settings, "SHARD_DATABASES", [])
+    if using not in shards or not shards.index(using):
+        return
+
+    start = shards.index(using) * SHARD_ID_BLOCK
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        for model in sender.get_models():
+            if not is_sharded(model):
+                continue
+
+            table = model._meta.db_table
+            cursor.execute(f"SELECT MAX(id) FROM {connection.ops.quote_name(table)}")
+            if (cursor.fetchone()[0] or 0) >= start:
+                continue
+
+            if connection.vendor == "sqlite":
+                cursor.execute("DELETE FROM sqlite_sequence WHERE name = %s", [table])
+                cursor.execute("INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)", [table, start])
+            elif connection.vendor == "postgresql":
+                cursor.execute("SELECT setval(pg_get_serial_sequence(%s, 'id'), %s, false)", [table, start + 1])
+
+
+class ShardRouter:
+    """
+    Sends the seller-owned models to the shard of the seller being served. Rows loaded from a shard keep using
+    it, so related lookups (order.items, item.product) follow their parent. Every database has the full schema.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not is_sharded(model):
+            return None
+
+        alias = _current_shard.get()
+        instance = hints.get("instance")
+        if instance is not None and is_sharded(type(instance)) and instance._state.db in self.shards():
+            alias = instance._state.db
+        # The first shard is the primary, whose reads ReplicaRouter may still send to a replica.
+        return None if alias == "default" else alias
+
+    db_for_write = db_for_read
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if obj1._state.db not in self.shards() and obj2._state.db not in self.shards():
+            return None
+        # Seller rows are read from "default" but are copied to every shard that holds their data.
+        if isinstance(obj1, Sellers) or isinstance(obj2, Sellers):
+            return True
+        return obj1._state.db == obj2._state.db
+
+    def shards(self):
+        return getattr(settings, "SHARD_DATABASES", ["default"])[1:]
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not _read_from_replica.get() or connections["default"].in_atomic_block:
+            return "default"
+
+        now = time.monotonic()
+        replicas = [alias for alias in getattr(settings, "REPLICA_DATABASES", [])
+                    if _replica_down_until.get(alias, 0) <= now]
+        random.shuffle(replicas)
+        for alias in replicas:
+            try:
+                connections[alias].ensure_connection()
+                return alias
+            except DatabaseError:
+                # Skip an unreachable replica for a while instead of paying the connect timeout on every query.
+                _replica_down_until[alias] = now + getattr(settings, "REPLICA_RETRY_SECONDS", 30)
+        return "default"
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {"default", *getattr(settings, "REPLICA_DATABASES", [])}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
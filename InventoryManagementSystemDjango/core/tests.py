@@ -0,0 +1,508 @@
+import io
+import os
+import re
+import runpy
+import tempfile
+import time
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
+
+from PIL import Image
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import OperationalError, connections
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
+
+from core import images, renderers, routers
+from core.middleware import ReplicaRoutingMiddleware
+from core.models import SellerShard
+from core.utils import generate_jwt
+from products.models import Products
+from users.models import Sellers
+
+
+class MetricsAccessTests(TestCase):
+    @override_settings(METRICS_ALLOWED_IPS=["127.0.0.1"])
+    def test_allowed_address_gets_metrics(self):
+        response = self.client.get("/metrics")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"http_requests_total", response.content)
+
+    @override_settings(METRICS_ALLOWED_IPS=["10.0.0.0/8"], METRICS_TOKEN="")
+    def test_other_addresses_are_refused(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+        self.assertEqual(self.client.get("/metrics", REMOTE_ADDR="10.1.2.3").status_code, 200)
+
+    @override_settings(METRICS_ALLOWED_IPS=[], METRICS_TOKEN="scrape-me")
+    def test_token_grants_access_from_anywhere(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+        self.assertEqual(self.client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code, 403)
+        self.assertEqual(self.client.get("/metrics", headers={"Authorization": "Bearer scrape-me"}).status_code, 200)
+
+
+class QueryInstrumentationTests(TestCase):
+    def setUp(self):
+        self.seller = Sellers.objects.create(name="Seller", username="instrumented", password="!")
+        Products.objects.create(seller=self.seller, name="Lamp", price=2, quantity=5, category="home")
+        self.headers = {"Authorization": f"Bearer {generate_jwt(self.seller.id)}"}
+
+    def query_count(self, response):
+        return int(re.search(r'desc="(\d+) queries"', response["Server-Timing"]).group(1))
+
+    def test_sync_request_counts_its_queries(self):
+        response = self.client.get("/products/", headers=self.headers)
+
+        self.assertGreater(self.query_count(response), 0)
+
+    async def test_async_requests_count_their_queries(self):
+        for url in ["/products/async/", "/products/"]:
+            response = await self.async_client.get(url, headers=self.headers)
+            self.assertEqual(response.status_code, 200, url)
+            self.assertGreater(self.query_count(response), 0, url)
+
+    async def test_wrappers_are_removed_after_the_request(self):
+        await self.async_client.get("/products/async/", headers=self.headers)
+
+        wrappers = await sync_to_async(lambda: connections["default"].execute_wrappers, thread_sensitive=True)()
+        self.assertEqual(wrappers, [])
+
+
+@override_settings(REPLICA_DATABASES=["replica_0"], REPLICA_RETRY_SECONDS=30)
+class ReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.router = routers.ReplicaRouter()
+        self.connections = {"default": mock.Mock(in_atomic_block=False), "replica_0": mock.Mock()}
+        patcher = mock.patch("core.routers.connections", self.connections)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(routers._replica_down_until.clear)
+
+    def read(self, replicas=True):
+        token = routers.use_replicas(replicas)
+        try:
+            return self.router.db_for_read(Products)
+        finally:
+            routers.reset_replicas(token)
+
+    def test_reads_go_to_a_replica_only_when_enabled(self):
+        self.assertEqual(self.read(), "replica_0")
+        self.assertEqual(self.read(replicas=False), "default")
+        self.assertEqual(self.router.db_for_read(Products), "default")
+
+    def test_writes_and_reads_in_atomic_blocks_use_the_primary(self):
+        self.assertEqual(self.router.db_for_write(Products), "default")
+
+        self.connections["default"].in_atomic_block = True
+        self.assertEqual(self.read(), "default")
+
+    def test_unreachable_replica_falls_back_and_is_skipped_for_a_while(self):
+        self.connections["replica_0"].ensure_connection.side_effect = OperationalError("unreachable")
+
+        self.assertEqual(self.read(), "default")
+        self.assertEqual(self.read(), "default")
+        self.assertEqual(self.connections["replica_0"].ensure_connection.call_count, 1)
+
+
+@override_settings(REPLICA_DATABASES=["replica_0"])
+class ReplicaRoutingMiddlewareTests(TestCase):
+    def setUp(self):
+        self.seller = Sellers.objects.create(name="Seller", username="replicas", password="!")
+        self.headers = {"Authorization": f"Bearer {generate_jwt(self.seller.id)}"}
+        self.factory = RequestFactory()
+        self.middleware = ReplicaRoutingMiddleware(self.seen)
+        # Seller ids are reused between tests, so a write made by an earlier test may still pin this one.
+        cache.delete(f"primary-pin:{self.seller.id}")
+        self.addCleanup(cache.delete, f"primary-pin:{self.seller.id}")
+
+    def seen(self, request):
+        self.read_from_replica = routers._read_from_replica.get()
+        return HttpResponse()
+
+    def send(self, method):
+        self.middleware(self.factory.generic(method, "/products/", headers=self.headers))
+        return self.read_from_replica
+
+    def test_safe_methods_read_from_replicas(self):
+        self.assertTrue(self.send("GET"))
+        self.assertTrue(self.send("HEAD"))
+        self.assertFalse(routers._read_from_replica.get())
+
+    def test_unsafe_method_uses_the_primary_and_pins_the_seller(self):
+        self.assertFalse(self.send("POST"))
+
+        self.assertFalse(self.send("GET"))
+
+    @override_settings(READ_YOUR_WRITES_SECONDS=0.2)
+    def test_pin_expires_after_read_your_writes_seconds(self):
+        self.send("PATCH")
+        self.assertFalse(self.send("GET"))
+
+        time.sleep(0.3)
+        self.assertTrue(self.send("GET"))
+
+    def test_pin_is_per_seller(self):
+        self.send("POST")
+
+        other = Sellers.objects.create(name="Other", username="other", password="!")
+        self.headers = {"Authorization": f"Bearer {generate_jwt(other.id)}"}
+        self.assertTrue(self.send("GET"))
+
+    async def test_async_requests_follow_the_same_rules(self):
+        async def seen(request):
+            return self.seen(request)
+
+        middleware = ReplicaRoutingMiddleware(seen)
+        await middleware(self.factory.get("/products/", headers=self.headers))
+        self.assertTrue(self.read_from_replica)
+
+        await middleware(self.factory.post("/products/", headers=self.headers))
+        self.assertFalse(self.read_from_replica)
+
+        await middleware(self.factory.get("/products/", headers=self.headers))
+        self.assertFalse(self.read_from_replica)
+
+
+class SQLiteProfileTests(SimpleTestCase):
+    def test_new_connection_applies_the_pragmas(self):
+        with tempfile.TemporaryDirectory() as directory:
+            connection = DatabaseWrapper({**connections["default"].settings_dict,
+                                          "NAME": os.path.join(directory, "pragmas.sqlite3")}, alias="pragmas")
+            try:
+                with connection.cursor() as cursor:
+                    pragmas = {}
+                    for pragma in ["journal_mode", "busy_timeout", "synchronous"]:
+                        cursor.execute(f"PRAGMA {pragma}")
+                        pragmas[pragma] = cursor.fetchone()[0]
+            finally:
+                connection.close()
+
+        self.assertEqual(pragmas, {"journal_mode": "wal", "busy_timeout": 5000, "synchronous": 1})
+
+
+class DatabaseProfileTests(SimpleTestCase):
+    def load_settings(self, **environ):
+        environ = {"DB_REPLICAS": "", "DB_SHARDS": "", **environ}
+        with mock.patch.dict(os.environ, environ):
+            for name in ["DB_ENGINE", "DB_POOL", "DB_CONN_MAX_AGE"]:
+                if name not in environ:
+                    os.environ.pop(name, None)
+            return runpy.run_path(os.path.join(settings.BASE_DIR, "InventoryManagementSystemDjango", "settings.py"))
+
+    def test_sqlite_is_the_default_profile(self):
+        database = self.load_settings()["DATABASES"]["default"]
+
+        self.assertEqual(database["ENGINE"], "django.db.backends.sqlite3")
+        self.assertEqual(database["CONN_MAX_AGE"], 60)
+        self.assertEqual(database["OPTIONS"]["transaction_mode"], "IMMEDIATE")
+
+    def test_postgresql_keeps_persistent_connections_without_a_pool(self):
+        database = self.load_settings(DB_ENGINE="postgresql", DB_CONN_MAX_AGE="120")["DATABASES"]["default"]
+
+        self.assertEqual(database["ENGINE"], "django.db.backends.postgresql")
+        self.assertEqual(database["CONN_MAX_AGE"], 120)
+        self.assertEqual(database["OPTIONS"], {})
+
+    def test_postgresql_pool_replaces_persistent_connections(self):
+        database = self.load_settings(DB_ENGINE="postgresql", DB_POOL="1", DB_POOL_MAX_SIZE="8")["DATABASES"]["default"]
+
+        self.assertEqual(database["CONN_MAX_AGE"], 0)
+        self.assertEqual(database["OPTIONS"]["pool"]["max_size"], 8)
+
+    def test_replicas_and_shards_get_their_own_aliases(self):
+        loaded = self.load_settings(DB_REPLICAS="replica.sqlite3", DB_SHARDS="one.sqlite3,two.sqlite3")
+
+        self.assertEqual(loaded["REPLICA_DATABASES"], ["replica_0"])
+        self.assertEqual(loaded["SHARD_DATABASES"], ["default", "shard_1", "shard_2"])
+        self.assertNotIn("transaction_mode", loaded["DATABASES"]["replica_0"]["OPTIONS"])
+        self.assertEqual(loaded["DATABASES"]["shard_2"]["NAME"], "two.sqlite3")
+
+
+class SynchronousExecutor:
+    """Stands in for the image worker pool; jobs run when run() is called instead of on a thread."""
+
+    def __init__(self):
+        self.jobs = []
+
+    def submit(self, fn, *args):
+        self.jobs.append((fn, args))
+
+    def run(self):
+        while self.jobs:
+            fn, args = self.jobs.pop(0)
+            fn(*args)
+
+
+@override_settings(IMAGE_THUMBNAIL_SIZES={"small": 32, "medium": 64})
+class ImageProcessingTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        media = override_settings(MEDIA_ROOT=media_root.name)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        self.executor = SynchronousExecutor()
+        patcher = mock.patch.object(images, "get_executor", return_value=self.executor)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.seller = Sellers.objects.create(name="Seller", username="images", password="!")
+        self.client.defaults["HTTP_AUTHORIZATION"] = f"Bearer {generate_jwt(self.seller.id)}"
+
+    def upload(self):
+        # A 200x100 photo whose EXIF orientation says it was taken rotated 90 degrees clockwise.
+        image = Image.new("RGB", (200, 100), "red")
+        exif = image.getexif()
+        exif[0x0112] = 6
+        exif[0x010F] = "Camera Maker"
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", exif=exif.tobytes())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post("/products/", {"name": "Photo", "price": "1", "quantity": 1,
+                                                       "category": "home",
+                                                       "image": SimpleUploadedFile("photo.jpg", buffer.getvalue(),
+                                                                                   "image/jpeg")})
+        self.assertEqual(response.status_code, 201, response.content)
+        return Products.objects.get(id=response.json()["data"]["id"])
+
+    def open_variant(self, name):
+        with default_storage.open(name) as variant:
+            image = Image.open(variant)
+            image.load()
+        return image
+
+    def test_variants_are_upright_stripped_and_recorded(self):
+        product = self.upload()
+        self.assertEqual(product.image_variants, {})
+
+        self.executor.run()
+        product.refresh_from_db()
+
+        self.assertEqual(set(product.image_variants), {"compressed", "small", "medium"})
+        self.assertEqual(product.version, 2)
+        compressed = self.open_variant(product.image_variants["compressed"])
+        self.assertEqual(compressed.size, (100, 200))
+        self.assertEqual(dict(compressed.getexif()), {})
+        self.assertNotIn("exif", compressed.info)
+        self.assertEqual(self.open_variant(product.image_variants["small"]).size, (16, 32))
+        self.assertEqual(self.open_variant(product.image_variants["medium"]).size, (32, 64))
+
+    def test_job_for_a_replaced_image_leaves_the_product_alone(self):
+        product = self.upload()
+        Products.objects.filter(id=product.id).update(image="products/replacement.jpg")
+
+        self.executor.run()
+        product.refresh_from_db()
+
+        self.assertEqual(product.image_variants, {})
+        self.assertEqual(product.version, 1)
+        self.assertEqual(default_storage.listdir(f"products/variants/{product.id}")[1], [])
+
+
+class ServeMediaTests(TestCase):
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        media = override_settings(MEDIA_ROOT=os.path.join(root.name, "media"))
+        media.enable()
+        self.addCleanup(media.disable)
+
+        os.makedirs(os.path.join(settings.MEDIA_ROOT, "products"))
+        self.content = bytes(range(100))
+        with open(os.path.join(settings.MEDIA_ROOT, "products", "photo one.jpg"), "wb") as f:
+            f.write(self.content)
+        with open(os.path.join(root.name, "outside.txt"), "wb") as f:
+            f.write(b"secret")
+        self.url = "/media/products/photo%20one.jpg"
+
+    def test_full_response_carries_validators(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), self.content)
+        self.assertEqual(response["Content-Type"], "image/jpeg")
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertEqual(response["Cache-Control"], f"public, max-age={settings.MEDIA_CACHE_MAX_AGE}")
+        self.assertTrue(response["ETag"])
+        self.assertTrue(response["Last-Modified"])
+
+    def test_conditional_requests_answer_304(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(self.client.get(self.url, headers={"If-None-Match": response["ETag"]}).status_code, 304)
+        self.assertEqual(self.client.get(self.url, headers={"If-Modified-Since": response["Last-Modified"]})
+                         .status_code, 304)
+        self.assertEqual(self.client.get(self.url, headers={"If-None-Match": '"stale"'}).status_code, 200)
+
+    def test_ranges(self):
+        for header, status, content_range, body in [
+            ("bytes=10-19", 206, "bytes 10-19/100", self.content[10:20]),
+            ("bytes=90-", 206, "bytes 90-99/100", self.content[90:]),
+            ("bytes=-5", 206, "bytes 95-99/100", self.content[95:]),
+            ("bytes=-500", 206, "bytes 0-99/100", self.content),
+            ("bytes=95-500", 206, "bytes 95-99/100", self.content[95:]),
+            ("bytes=100-", 416, "bytes */100", None),
+            ("bytes=-0", 416, "bytes */100", None),
+        ]:
+            with self.subTest(header):
+                response = self.client.get(self.url, headers={"Range": header})
+                self.assertEqual(response.status_code, status)
+                self.assertEqual(response["Content-Range"], content_range)
+                if body is not None:
+                    self.assertEqual(b"".join(response.streaming_content), body)
+                    self.assertEqual(response["Content-Length"], str(len(body)))
+
+        # Malformed and multi-range headers are ignored and the whole file is sent.
+        for header in ["bytes=5-1,7-9", "items=0-5", "bytes=-"]:
+            self.assertEqual(self.client.get(self.url, headers={"Range": header}).status_code, 200)
+
+    def test_if_range_only_applies_the_range_to_the_same_version(self):
+        etag = self.client.get(self.url)["ETag"]
+
+        self.assertEqual(self.client.get(self.url, headers={"Range": "bytes=0-9", "If-Range": etag}).status_code, 206)
+        stale = self.client.get(self.url, headers={"Range": "bytes=0-9", "If-Range": '"stale"'})
+        self.assertEqual(stale.status_code, 200)
+        self.assertEqual(b"".join(stale.streaming_content), self.content)
+
+    def test_paths_outside_media_root_are_not_found(self):
+        for url in ["/media/../outside.txt", "/media/%2e%2e/outside.txt", "/media/products/..%2f..%2foutside.txt",
+                    "/media//etc/passwd", "/media/products/missing.jpg", "/media/products"]:
+            self.assertEqual(self.client.get(url).status_code, 404, url)
+
+    def test_only_reads_are_allowed(self):
+        self.assertEqual(self.client.post(self.url).status_code, 405)
+
+    @override_settings(MEDIA_OFFLOAD="x-accel-redirect", MEDIA_OFFLOAD_PREFIX="/protected-media/")
+    def test_x_accel_redirect_hands_off_a_quoted_path(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["X-Accel-Redirect"], "/protected-media/products/photo%20one.jpg")
+        self.assertEqual(response["Content-Type"], "image/jpeg")
+        self.assertEqual(response.content, b"")
+        self.assertIn("ETag", response)
+
+    @override_settings(MEDIA_OFFLOAD="x-sendfile")
+    def test_x_sendfile_hands_off_the_file_path(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response["X-Sendfile"], os.path.join(settings.MEDIA_ROOT, "products", "photo one.jpg"))
+        self.assertEqual(response.content, b"")
+
+    @override_settings(MEDIA_OFFLOAD="x-accel-redirect")
+    def test_offloaded_responses_still_answer_304(self):
+        etag = self.client.get(self.url)["ETag"]
+
+        response = self.client.get(self.url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertNotIn("X-Accel-Redirect", response)
+
+
+class FastJSONRendererTests(SimpleTestCase):
+    cases = {
+        "decimal": {"price": Decimal("19.90"), "total": Decimal("1E+3")},
+        "aware datetime": {"at": datetime(2026, 3, 1, 12, 30, 5, 123456, tzinfo=dt_timezone.utc)},
+        "offset datetime": {"at": datetime(2026, 3, 1, 12, 30, tzinfo=dt_timezone(timedelta(hours=5, minutes=30)))},
+        "naive datetime": {"at": datetime(2026, 3, 1, 12, 30, 5), "on": date(2026, 3, 1)},
+        "int keys": {1: "one", 20: {3: [4]}},
+        "lazy string": {"msg": gettext_lazy("Products fetched successfully")},
+        "line terminators": {"name": "a\u2028b\u2029c", "unicode": "caf\u00e9 \u2603"},
+        "nested": {"success": True, "data": {"products": [{"id": 1, "price": Decimal("2.50"), "tags": None}]}},
+    }
+
+    def assert_matches_drf(self):
+        for label, data in self.cases.items():
+            with self.subTest(label):
+                self.assertEqual(renderers.FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_output_matches_drf(self):
+        self.assertIsNotNone(renderers.orjson)
+        self.assert_matches_drf()
+
+    def test_output_matches_drf_without_orjson(self):
+        with mock.patch.object(renderers, "orjson", None):
+            self.assert_matches_drf()
+            self.assertEqual(renderers.dumps(self.cases["line terminators"]),
+                             JSONRenderer().render(self.cases["line terminators"]))
+
+    def test_indented_output_is_left_to_drf(self):
+        data = self.cases["nested"]
+
+        self.assertEqual(renderers.FastJSONRenderer().render(data, "application/json; indent=4"),
+                         JSONRenderer().render(data, "application/json; indent=4"))
+        self.assertEqual(renderers.FastJSONRenderer().render(None), b"")
+
+
+@override_settings(SHARD_DATABASES=["default", "shard_1"])
+class ShardRouterTests(TestCase):
+    """
+    Runs without DB_SHARDS: "shard_1" is only a name here, so nothing may query it. ShardRoutingTests in
+    products/tests.py and RegistrationTests in users/tests.py cover real shards when DB_SHARDS is set.
+    """
+
+    def setUp(self):
+        self.router = routers.ShardRouter()
+        self.seller = Sellers.objects.create(name="Seller", username="router", password="!")
+        self.addCleanup(routers.invalidate_shard, self.seller.id)
+
+    def on(self, alias, instance):
+        instance._state.db = alias
+        return instance
+
+    def test_seller_owned_models_follow_the_current_shard(self):
+        self.assertIsNone(self.router.db_for_read(Products))
+
+        token = routers.use_shard("shard_1")
+        try:
+            self.assertEqual(self.router.db_for_read(Products), "shard_1")
+            self.assertEqual(self.router.db_for_write(Products), "shard_1")
+            self.assertIsNone(self.router.db_for_read(Sellers))
+            self.assertIsNone(self.router.db_for_write(SellerShard))
+        finally:
+            routers.reset_shard(token)
+
+    def test_related_lookups_stay_on_the_instance_shard(self):
+        product = self.on("shard_1", Products(seller_id=self.seller.id))
+
+        self.assertEqual(self.router.db_for_read(Products, instance=product), "shard_1")
+        self.assertIsNone(self.router.db_for_read(Products, instance=self.on("default", Products())))
+
+    def test_relations_stay_within_a_shard(self):
+        product = self.on("shard_1", Products())
+
+        self.assertTrue(self.router.allow_relation(self.on("default", Sellers()), product))
+        self.assertFalse(self.router.allow_relation(self.on("default", Products()), product))
+        self.assertTrue(self.router.allow_relation(self.on("shard_1", Products()), product))
+        self.assertIsNone(self.router.allow_relation(self.on("default", Products()), self.on("default", Products())))
+
+    def test_shard_lookup_is_cached_until_invalidated(self):
+        self.assertEqual(routers.get_shard(self.seller.id), ("default", False))
+
+        SellerShard.objects.create(seller=self.seller, alias="shard_1", locked=True)
+        self.assertEqual(routers.get_shard(self.seller.id), ("default", False))
+
+        routers.invalidate_shard(self.seller.id)
+        self.assertEqual(routers.get_shard(self.seller.id), ("shard_1", True))
+        with routers.seller_shard(self.seller.id):
+            self.assertEqual(routers.current_shard(), "shard_1")
+        self.assertEqual(routers.current_shard(), "default")
+
+    def test_new_sellers_are_spread_by_id(self):
+        with mock.patch.object(routers, "copy_seller_to_shard") as copy:
+            alias = routers.assign_shard(self.seller)
+
+        self.assertEqual(alias, ["default", "shard_1"][self.seller.id % 2])
+        copy.assert_called_once_with(self.seller, alias)
+        self.assertEqual(SellerShard.objects.get(seller=self.seller).alias, alias)
+        self.assertEqual(routers.get_shard(self.seller.id), (alias, False))
+
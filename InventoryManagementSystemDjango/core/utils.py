@@ -1,14 +1,31 @@
+import base64
+import csv
 import datetime
+import hashlib
+import io
+import json
 
 import jwt
 from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import DataError, IntegrityError, transaction
+from django.db.models import Case, Count, F, IntegerField, Prefetch, Q, Value, When
+from django.http import HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags, quote_etag
 from rest_framework import status
 from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
 
+from core.cache import seller_cache
+from core.metrics import record_order, STOCK_REJECTIONS
+from core.renderers import dumps
+from core.routers import current_shard
+from core.models import ResourceVersion
 from users.models import Sellers
-from orders.models import OrderItems
-from products.models import Products
+from orders.models import Orders, OrderItems, SalesRollup
+from products.models import Products, InventorySummary, ProductTrigram, StockMovement
 
 
 def success_response(data=None, msg="", status_code=200):
@@ -18,18 +35,115 @@ def success_response(data=None, msg="", status_code=200):
                     status=status_code)
 
 
-def error_response(msg="", status_code=400):
-    return Response({"success": False,
-                     "msg": msg},
-                    status=status_code)
+def error_response(msg="", status_code=400, data=None):
+    body = {"success": False,
+            "msg": msg}
+    if data is not None:
+        body["data"] = data
+    return Response(body, status=status_code)
+
+
+def json_success_response(data=None, msg="", status_code=200):
+    return JsonResponse({"success": True,
+                         "msg": msg,
+                         "data": data},
+                        status=status_code,
+                        encoder=JSONEncoder,
+                        json_dumps_params={"ensure_ascii": False, "separators": (",", ":")})
+
+
+def json_error_response(msg="", status_code=400):
+    return JsonResponse({"success": False,
+                         "msg": msg},
+                        status=status_code,
+                        json_dumps_params={"ensure_ascii": False, "separators": (",", ":")})
+
+
+def dump_json(data):
+    return dumps(data).decode()
+
+
+def streaming_success_response(rows, key, msg="", ndjson=False, batch_size=500):
+    def render():
+        batch = []
+        if not ndjson:
+            yield '{"success":true,"msg":' + dump_json(msg) + ',"data":{' + dump_json(key) + ':['
+        for index, row in enumerate(rows):
+            if ndjson:
+                batch.append(dump_json(row) + "\n")
+            else:
+                batch.append(("," if index else "") + dump_json(row))
+            if len(batch) >= batch_size:
+                yield "".join(batch)
+                batch = []
+        if batch:
+            yield "".join(batch)
+        if not ndjson:
+            yield "]}}"
+
+    content_type = "application/x-ndjson" if ndjson else "application/json"
+    return StreamingHttpResponse(render(), content_type=content_type)
+
+
+def make_etag(*parts):
+    return quote_etag(hashlib.sha1("|".join(str(part) for part in parts).encode()).hexdigest())
+
+
+def etag_matches(request, etag):
+    header = request.headers.get("If-None-Match")
+    if not header:
+        return False
+
+    etags = parse_etags(header)
+    return "*" in etags or etag in [e.removeprefix("W/") for e in etags]
+
+
+def not_modified_response(etag):
+    return with_etag(HttpResponseNotModified(), etag)
+
+
+def with_etag(response, etag):
+    response["ETag"] = etag
+    patch_vary_headers(response, ["Authorization"])
+    return response
+
+
+def get_collection_etag(seller, request, *resources):
+    versions = ResourceVersion.get(seller.id, *resources)
+    return make_etag(seller.id, *resources, *versions, request.GET.urlencode())
 
 
 def get_seller(seller_id):
+    seller = seller_cache.get(seller_id)
+    if seller is not None:
+        return seller
+
+    try:
+        seller = Sellers.objects.get(id=seller_id, is_deleted=False)
+    except Sellers.DoesNotExist:
+        raise Sellers.DoesNotExist("Seller not found")
+
+    seller_cache.set(seller)
+    return seller
+
+
+async def aget_seller(seller_id):
+    seller = await seller_cache.aget(seller_id)
+    if seller is not None:
+        return seller
+
     try:
-        return Sellers.objects.get(id=seller_id, is_deleted=False)
+        seller = await Sellers.objects.aget(id=seller_id, is_deleted=False)
     except Sellers.DoesNotExist:
         raise Sellers.DoesNotExist("Seller not found")
 
+    await seller_cache.aset(seller)
+    return seller
+
+
+def invalidate_seller(seller_id):
+    seller_cache.delete(seller_id)
+
 
 def get_product(product_id):
     try:
@@ -40,11 +154,70 @@ def get_product(product_id):
 
 def get_product_for_seller(product_id, seller):
     product = get_product(product_id)
-    if product.seller != seller:
+    if product.seller_id != seller.id:
         raise Products.DoesNotExist("Product not found")
     return product
 
 
+def serialize_product(product):
+    thumbnails = None
+    if product.image_variants:
+        thumbnails = {label: default_storage.url(name) for label, name in product.image_variants.items()}
+
+    return {"id": product.id,
+            "name": product.name,
+            "price": product.price,
+            "quantity": product.quantity,
+            "category": product.category,
+            "expiry": product.expiry,
+            "image": product.image.url if product.image else None,
+            "thumbnails": thumbnails
+            }
+
+
+def search_products(seller, query, category=None, limit=20, page=1, max_candidates=500, min_score=0.3):
+    query = query.strip()
+    query_trigrams = ProductTrigram.extract(query)
+    if not query_trigrams:
+        raise ValueError("Query must contain letters or digits")
+
+    candidates = (ProductTrigram.objects.filter(seller=seller, trigram__in=query_trigrams)
+                  .values("product_id")
+                  .annotate(shared=Count("id"))
+                  .order_by("-shared")[:max_candidates])
+    shared = {row["product_id"]: row["shared"] for row in candidates}
+    products = Products.objects.filter(id__in=shared.keys(), is_deleted=False).in_bulk()
+
+    needle = query.lower()
+    ranked = []
+    for product in products.values():
+        score = shared[product.id] / len(query_trigrams)
+        name = product.name.lower()
+        if name.startswith(needle):
+            score += 1
+        elif needle in name or needle in product.category.lower():
+            score += 0.5
+        if score >= min_score:
+            ranked.append((score, product))
+
+    facets = {}
+    for _, product in ranked:
+        facets[product.category] = facets.get(product.category, 0) + 1
+
+    if category:
+        ranked = [(score, product) for score, product in ranked if product.category == category]
+
+    ranked.sort(key=lambda entry: (-entry[0], entry[1].id))
+    offset = (page - 1) * limit
+    return {"products": [{**serialize_product(product), "score": round(score, 3)}
+                         for score, product in ranked[offset:offset + limit]],
+            "total": len(ranked),
+            "page": page,
+            "facets": {"category": [{"value": value, "count": count}
+                                    for value, count in sorted(facets.items(), key=lambda f: (-f[1], f[0]))]}
+            }
+
+
 def parse_expiry(expiry):
     try:
         return datetime.datetime.strptime(expiry, "%Y-%m-%d").date()
@@ -85,7 +258,217 @@ def validate_product_fields(data, partial=False):
     return parsed
 
 
-def generate_jwt(user_id, expiry_minutes=30):
+class ProductImportError(ValueError):
+    """An import stopped part-way; ``result`` counts the rows committed before it."""
+
+    def __init__(self, msg, result):
+        super().__init__(msg)
+        self.result = result
+
+
+def iter_import_rows(upload, file_format):
+    if file_format not in ["csv", "ndjson"]:
+        raise ValueError("Format must be csv or ndjson")
+
+    lines = io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline="")
+
+    if file_format == "csv":
+        reader = csv.DictReader(lines)
+        for row in reader:
+            row = {key: value for key, value in row.items() if key is not None and value not in (None, "")}
+            yield (reader.line_num, row, None)
+        return
+
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield (line_number, None, "Invalid JSON")
+            continue
+        if not isinstance(row, dict):
+            yield (line_number, None, "Each line must be a JSON object")
+            continue
+        yield (line_number, row, None)
+
+
+def insert_product_batch(seller, batch):
+    with transaction.atomic(using=current_shard()):
+        Products.objects.bulk_create(batch)
+        InventorySummary.record(seller.id, [(None, (product.quantity, product.price)) for product in batch])
+        StockMovement.record(seller.id, "CREATED", {product.id: product.quantity for product in batch})
+        ProductTrigram.index(batch)
+        ResourceVersion.bump(seller.id, "products")
+
+
+def import_products(seller, rows, batch_size=1000, max_errors=100):
+    created = 0
+    failed = 0
+    errors = []
+    batch = []
+
+    # Batches commit as they fill, so an error that stops the import reports what was already saved.
+    try:
+        for row_number, row, error in rows:
+            if error is None:
+                try:
+                    parsed = validate_product_fields(row)
+                    expiry = row.get("expiry")
+                    if expiry:
+                        parsed["expiry"] = parse_expiry(str(expiry).strip())
+                    batch.append(Products(seller=seller, **parsed))
+                except ValueError as e:
+                    error = str(e)
+
+            if error is not None:
+                failed += 1
+                if len(errors) < max_errors:
+                    errors.append({"row": row_number, "msg": error})
+
+            if len(batch) >= batch_size:
+                insert_product_batch(seller, batch)
+                created += len(batch)
+                batch = []
+
+        if batch:
+            insert_product_batch(seller, batch)
+            created += len(batch)
+
+    except UnicodeDecodeError:
+        stopped = "File must be UTF-8 encoded"
+    except csv.Error as e:
+        stopped = f"Invalid CSV: {e}"
+    except (DataError, IntegrityError):
+        stopped = "Products could not be saved"
+    else:
+        stopped = None
+
+    result = {"created": created,
+              "failed": failed,
+              "errors": errors}
+    if stopped:
+        raise ProductImportError(f"{stopped}; import stopped after {created} products were created", result)
+    return result
+
+
+def parse_limit(limit, default=50, maximum=500):
+    if limit in (None, ""):
+        return default
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        raise ValueError("Limit must be a number")
+    if limit <= 0:
+        raise ValueError("Limit must be a positive integer")
+    return min(limit, maximum)
+
+
+def paginate_products(products, params):
+    limit = parse_limit(params.get("limit"))
+    cursor = params.get("cursor")
+    page = params.get("page")
+    offset = 0
+
+    if cursor:
+        after_id, = decode_cursor(cursor, parts=1)
+        if not after_id.isdigit():
+            raise ValueError("Invalid cursor")
+        products = products.filter(id__gt=int(after_id))
+    elif page:
+        if not page.isdigit() or int(page) <= 0:
+            raise ValueError("Page must be a positive integer")
+        offset = (int(page) - 1) * limit
+
+    return (products[offset:offset + limit + 1], limit)
+
+
+def paginate_orders(orders, params):
+    limit = parse_limit(params.get("limit"))
+    cursor = params.get("cursor")
+
+    if cursor:
+        timestamp, order_id = decode_cursor(cursor, parts=2)
+        try:
+            timestamp = datetime.datetime.fromisoformat(timestamp)
+            order_id = int(order_id)
+        except ValueError:
+            raise ValueError("Invalid cursor")
+        orders = orders.filter(Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lt=order_id))
+
+    return (orders[:limit + 1], limit)
+
+
+def split_page(rows, limit, cursor):
+    if len(rows) <= limit:
+        return (rows, None)
+
+    rows = rows[:limit]
+    return (rows, cursor(rows[-1]))
+
+
+def encode_cursor(*values):
+    raw = "|".join(str(value) for value in values)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor, parts):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+    values = raw.split("|")
+    if len(values) != parts:
+        raise ValueError("Invalid cursor")
+    return values
+
+
+REPORT_MAX_DAYS = {"hour": 31, "day": 366}
+
+
+def parse_report_range(start, end, granularity):
+    if granularity not in REPORT_MAX_DAYS:
+        raise ValueError("Granularity must be hour or day")
+
+    if not start or not end:
+        raise ValueError("Start and end are required")
+
+    start = parse_report_date(start)
+    end = parse_report_date(end)
+    if end < start:
+        raise ValueError("End must not be before start")
+
+    if (end - start).days + 1 > REPORT_MAX_DAYS[granularity]:
+        raise ValueError(f"Range may span at most {REPORT_MAX_DAYS[granularity]} days for {granularity} granularity")
+
+    start = datetime.datetime.combine(start, datetime.time.min, tzinfo=datetime.timezone.utc)
+    end = datetime.datetime.combine(end + datetime.timedelta(days=1), datetime.time.min, tzinfo=datetime.timezone.utc)
+    return (start, end)
+
+
+def parse_report_date(value):
+    try:
+        return datetime.datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise ValueError("Dates must be in YYYY-MM-DD format")
+
+
+def parse_as_of(value):
+    if not value:
+        return datetime.datetime.now(datetime.timezone.utc)
+
+    try:
+        as_of = datetime.datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError("as_of must be an ISO 8601 date or datetime")
+
+    if as_of.tzinfo is None:
+        as_of = as_of.replace(tzinfo=datetime.timezone.utc)
+    return as_of
+
+
+def generate_jwt(user_id, expiry_minutes=None):
+    expiry_minutes = expiry_minutes or settings.JWT_ACCESS_TOKEN_MINUTES
     payload = {"user_id": user_id,
                "exp": datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(minutes=expiry_minutes)
                }
@@ -93,6 +476,48 @@ def generate_jwt(user_id, expiry_minutes=30):
     return token
 
 
+def password_fingerprint(seller):
+    # Changing the password changes the fingerprint, which revokes every refresh token issued before.
+    return hashlib.sha256(f"{settings.SECRET_KEY}:{seller.password}".encode()).hexdigest()[:16]
+
+
+def generate_refresh_token(seller, expiry_days=None):
+    expiry_days = expiry_days or settings.JWT_REFRESH_TOKEN_DAYS
+    payload = {"user_id": seller.id,
+               "type": "refresh",
+               "pwd": password_fingerprint(seller),
+               "exp": datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(days=expiry_days)
+               }
+    return jwt.encode(payload, settings.SECRET_KEY, algorithm='HS256')
+
+
+def generate_tokens(seller):
+    return {"token": generate_jwt(seller.id),
+            "refresh_token": generate_refresh_token(seller)}
+
+
+def get_seller_from_refresh_token(token):
+    if not token or not isinstance(token, str):
+        return (None, "Refresh token is required")
+
+    decoded, error = decode_jwt(token)
+    if error:
+        return (None, error)
+
+    if decoded.get("type") != "refresh":
+        return (None, "Invalid token")
+
+    try:
+        seller = get_seller(decoded.get("user_id"))
+    except Sellers.DoesNotExist:
+        return (None, "Invalid user")
+
+    if decoded.get("pwd") != password_fingerprint(seller):
+        return (None, "Refresh token revoked")
+
+    return (seller, None)
+
+
 def decode_jwt(token):
     try:
         decoded = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
@@ -105,28 +530,35 @@ def decode_jwt(token):
         return (None, "Invalid token")
 
 
-def get_user_from_request(request):
+def get_user_id_from_request(request):
     auth_head = request.headers.get("Authorization")
     if not auth_head:
-        return (None, error_response(msg="Authorization header missing",
-                                     status_code=status.HTTP_401_UNAUTHORIZED))
+        return (None, "Authorization header missing")
 
     parts = auth_head.split()
     if len(parts) != 2:
-        return (None, error_response(msg="Invalid Authorization header format",
-                                     status_code=status.HTTP_401_UNAUTHORIZED))
+        return (None, "Invalid Authorization header format")
 
     scheme, token = parts
     if scheme.lower() != "bearer":
-        return (None, error_response(msg="Authorization header must start with Bearer",
-                                     status_code=status.HTTP_401_UNAUTHORIZED))
+        return (None, "Authorization header must start with Bearer")
 
     decoded, error = decode_jwt(token)
+    if error:
+        return (None, error)
+
+    if decoded.get("type") == "refresh":
+        return (None, "Refresh tokens cannot be used for API requests")
+
+    return (decoded.get("user_id"), None)
+
+
+def get_user_from_request(request):
+    user_id, error = get_user_id_from_request(request)
     if error:
         return (None, error_response(msg=error,
                                      status_code=status.HTTP_401_UNAUTHORIZED))
 
-    user_id = decoded.get("user_id")
     try:
         seller = get_seller(user_id)
     except Sellers.DoesNotExist:
@@ -136,11 +568,34 @@ def get_user_from_request(request):
     return (seller, None)
 
 
+async def aget_user_from_request(request):
+    user_id, error = get_user_id_from_request(request)
+    if error:
+        return (None, json_error_response(msg=error,
+                                          status_code=status.HTTP_401_UNAUTHORIZED))
+
+    try:
+        seller = await aget_seller(user_id)
+    except Sellers.DoesNotExist:
+        return (None, json_error_response(msg="Invalid user",
+                                          status_code=status.HTTP_401_UNAUTHORIZED))
+
+    return (seller, None)
+
+
 def validate_order_type(order_type):
     if order_type not in ["INCOMING", "OUTGOING"]:
         raise ValueError("Order type must be INCOMING or OUTGOING.")
 
 
+def validate_order_batch(orders, max_orders=100):
+    if not orders or not isinstance(orders, list):
+        raise ValueError("Orders must be a non-empty list.")
+
+    if len(orders) > max_orders:
+        raise ValueError(f"A batch may contain at most {max_orders} orders.")
+
+
 def validate_items(items):
     if not items or not isinstance(items, list):
         raise ValueError("Items must be a non-empty list.")
@@ -156,30 +611,94 @@ def validate_items(items):
             raise ValueError("Quantity must be a positive integer.")
 
 
+def get_products_for_seller(product_ids, seller):
+    try:
+        product_ids = {int(product_id) for product_id in product_ids}
+    except (TypeError, ValueError):
+        raise Products.DoesNotExist("Product not found")
+
+    products = Products.objects.filter(id__in=product_ids, seller=seller, is_deleted=False).in_bulk()
+    if len(products) != len(product_ids):
+        raise Products.DoesNotExist("Product not found")
+    return products
+
+
+def reserve_stock(seller, order_type, requested, products):
+    product_ids_by_quantity = {}
+    for product_id, quantity in requested.items():
+        product_ids_by_quantity.setdefault(quantity, []).append(product_id)
+    deltas = Case(*[When(id__in=product_ids, then=Value(quantity))
+                    for quantity, product_ids in product_ids_by_quantity.items()],
+                  output_field=IntegerField())
+    live_products = Products.objects.filter(id__in=requested.keys(), seller=seller, is_deleted=False)
+
+    if order_type == "OUTGOING":
+        updated = live_products.filter(quantity__gte=deltas).update(quantity=F("quantity") - deltas,
+                                                                    version=F("version") + 1)
+    else:
+        updated = live_products.update(quantity=F("quantity") + deltas, version=F("version") + 1)
+
+    if updated != len(requested):
+        available = dict(live_products.values_list("id", "quantity"))
+        for product_id, quantity in sorted(requested.items()):
+            if product_id not in available:
+                raise Products.DoesNotExist("Product not found")
+            if order_type == "OUTGOING" and available[product_id] < quantity:
+                STOCK_REJECTIONS.inc()
+                raise ValueError(f"Insufficient stock for product {products[product_id].name}.")
+        raise ValueError("Stock changed while the order was being processed.")
+
+
 def process_order_items(seller, order, items):
+    if order.order_type not in ["INCOMING", "OUTGOING"]:
+        raise ValidationError(f"Order type must be INCOMING or OUTGOING.")
+
+    products = get_products_for_seller(product_ids=[item["product_id"] for item in items],
+                                       seller=seller)
+
+    requested = {}
+    order_items = []
     total_price = 0
     for item in items:
-        product = get_product_for_seller(product_id=item["product_id"],
-                                         seller=seller)
+        product = products[int(item["product_id"])]
+        requested[product.id] = requested.get(product.id, 0) + item["quantity"]
+        order_item = OrderItems(order=order,
+                                product=product,
+                                quantity=item["quantity"],
+                                price_at_time=product.price,
+                                total=product.price * item["quantity"])
+        order_items.append(order_item)
+        total_price += order_item.total
 
-        quantity = item["quantity"]
-        price_at_time = product.price
+    with transaction.atomic(using=current_shard(), savepoint=False):
+        reserve_stock(seller=seller, order_type=order.order_type, requested=requested, products=products)
+        OrderItems.objects.bulk_create(order_items)
+        SalesRollup.record(order, order_items)
+        ResourceVersion.bump(seller.id, "products", "orders")
+
+        sign = -1 if order.order_type == "OUTGOING" else 1
+        StockMovement.record(seller.id, order.order_type,
+                             {product_id: sign * quantity for product_id, quantity in requested.items()}, order=order)
+        quantities = Products.objects.filter(id__in=requested.keys()).values_list("id", "quantity")
+        InventorySummary.record(seller.id, [((quantity - sign * requested[product_id], products[product_id].price),
+                                             (quantity, products[product_id].price))
+                                            for product_id, quantity in quantities])
+
+    record_order(order.order_type, len(order_items))
+    return total_price
 
-        if order.order_type == "OUTGOING":
-            if product.quantity < quantity:
-                raise ValueError(f"Insufficient stock for product {product.name}.")
-            product.quantity -= quantity
 
-        elif order.order_type == "INCOMING":
-            product.quantity += quantity
+def create_order(seller, order_type, items):
+    validate_order_type(order_type)
+    validate_items(items)
 
-        else:
-            raise ValidationError(f"Order type must be INCOMING or OUTGOING.")
+    with transaction.atomic(using=current_shard()):
+        order = Orders.objects.create(seller=seller, order_type=order_type)
+        order.total_price = process_order_items(seller=seller, order=order, items=items)
+        order.save(update_fields=["total_price"])
+    return order
 
-        product.save()
-        order_item = OrderItems.objects.create(order=order,
-                                               product=product,
-                                               quantity=quantity,
-                                               price_at_time=price_at_time)
-        total_price += order_item.total
-    return total_price
+
+def get_orders_for_seller(seller):
+    items = OrderItems.objects.select_related("product")
+    return Orders.objects.filter(seller=seller).prefetch_related(Prefetch("items", queryset=items))
@@ -0,0 +1,143 @@
+import hmac
+import ipaddress
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseForbidden, HttpResponseNotAllowed, \
+    StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from prometheus_client import CONTENT_TYPE_LATEST
+
+from core.metrics import render_metrics
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def parse_range(header, size):
+    """Return (start, end) for a single satisfiable byte range, None to ignore the header, or False if unsatisfiable."""
+    match = RANGE_RE.match(header.strip())
+    if not match or match.groups() == ("", ""):
+        return None
+
+    start, end = match.groups()
+    if start == "":
+        length = int(end)
+        if length == 0:
+            return False
+        return (max(size - length, 0), size - 1)
+
+    start = int(start)
+    end = int(end) if end else size - 1
+    if start >= size or end < start:
+        return False
+    return (start, min(end, size - 1))
+
+
+def read_range(path, start, length, chunk_size=64 * 1024):
+    with open(path, "rb") as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(chunk_size, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def serve_media(request, path):
+    if request.method not in ("GET", "HEAD"):
+        return HttpResponseNotAllowed(["GET", "HEAD"])
+
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404("File not found")
+
+    try:
+        stat = os.stat(full_path)
+    except OSError:
+        raise Http404("File not found")
+    if not os.path.isfile(full_path):
+        raise Http404("File not found")
+
+    etag = quote_etag(f"{stat.st_ino:x}-{stat.st_mtime_ns:x}-{stat.st_size:x}")
+    last_modified = int(stat.st_mtime)
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = build_media_response(request, path, full_path, stat.st_size, etag)
+
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    response["Cache-Control"] = f"public, max-age={getattr(settings, 'MEDIA_CACHE_MAX_AGE', 86400)}"
+    return response
+
+
+def build_media_response(request, path, full_path, size, etag):
+    content_type = mimetypes.guess_type(full_path)[0] or "application/octet-stream"
+
+    offload = getattr(settings, "MEDIA_OFFLOAD", None)
+    if offload == "x-accel-redirect":
+        # nginx serves the bytes (including ranges) from an internal location mapped to MEDIA_ROOT. It decodes the
+        # URI, so the path is percent-encoded to keep spaces, "?" and "#" in file names from breaking the header.
+        response = HttpResponse(content_type=content_type)
+        response["X-Accel-Redirect"] = getattr(settings, "MEDIA_OFFLOAD_PREFIX", "/protected-media/") + quote(path)
+        return response
+    if offload == "x-sendfile":
+        response = HttpResponse(content_type=content_type)
+        response["X-Sendfile"] = full_path
+        return response
+
+    byte_range = None
+    if "Range" in request.headers:
+        if_range = request.headers.get("If-Range")
+        if if_range is None or if_range == etag:
+            byte_range = parse_range(request.headers["Range"], size)
+
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{size}"
+        return response
+
+    if byte_range is None:
+        # FileResponse lets the server use wsgi.file_wrapper (sendfile) for the whole file.
+        response = FileResponse(open(full_path, "rb"), content_type=content_type)
+        response["Accept-Ranges"] = "bytes"
+        return response
+
+    start, end = byte_range
+    length = end - start + 1
+    response = StreamingHttpResponse(read_range(full_path, start, length), status=206, content_type=content_type)
+    response["Content-Range"] = f"bytes {start}-{end}/{size}"
+    response["Content-Length"] = str(length)
+    response["Accept-Ranges"] = "bytes"
+    return response
+
+
+def metrics_allowed(request):
+    token = getattr(settings, "METRICS_TOKEN", "")
+    if token and hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}"):
+        return True
+
+    try:
+        address = ipaddress.ip_address(request.META.get("REMOTE_ADDR", ""))
+    except ValueError:
+        return False
+    return any(address in ipaddress.ip_network(network, strict=False)
+               for network in getattr(settings, "METRICS_ALLOWED_IPS", []))
+
+
+def metrics(request):
+    if request.method != "GET":
+        return HttpResponseNotAllowed(["GET"])
+
+    if not metrics_allowed(request):
+        return HttpResponseForbidden()
+
+    return HttpResponse(render_metrics(), content_type=CONTENT_TYPE_LATEST)
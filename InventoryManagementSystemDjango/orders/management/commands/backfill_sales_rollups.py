@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.routers import use_shard, reset_shard
+
+from orders.models import SalesRollup
+
+
+class Command(BaseCommand):
+    help = "Rebuild the hourly and daily sales rollups from order items."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seller", type=int, nargs="+", dest="sellers",
+                            help="Only rebuild these seller ids (default: all sellers).")
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        for alias in getattr(settings, "SHARD_DATABASES", ["default"]):
+            token = use_shard(alias)
+            try:
+                SalesRollup.rebuild(seller_ids=options["sellers"], batch_size=options["batch_size"])
+            finally:
+                reset_shard(token)
+        self.stdout.write(self.style.SUCCESS("Sales rollups rebuilt."))
@@ -0,0 +1,73 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from core.utils import get_product_for_seller, process_order_items
+from orders.models import Orders, OrderItems
+from products.models import Products
+from users.models import Sellers
+
+
+def legacy_process_order_items(seller, order, items):
+    """Per-item implementation kept as the baseline for comparison."""
+    total_price = 0
+    for item in items:
+        product = get_product_for_seller(product_id=item["product_id"], seller=seller)
+        quantity = item["quantity"]
+        if order.order_type == "OUTGOING":
+            if product.quantity < quantity:
+                raise ValueError(f"Insufficient stock for product {product.name}.")
+            product.quantity -= quantity
+        else:
+            product.quantity += quantity
+
+        product.save()
+        order_item = OrderItems.objects.create(order=order,
+                                               product=product,
+                                               quantity=quantity,
+                                               price_at_time=product.price)
+        total_price += order_item.total
+    return total_price
+
+
+class Command(BaseCommand):
+    help = "Compare query counts and timings of the per-item and set-based order processing paths."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+", default=[1, 50, 500])
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--order-type", choices=["INCOMING", "OUTGOING"], default="OUTGOING")
+
+    def handle(self, *args, **options):
+        implementations = [("per-item", legacy_process_order_items),
+                           ("set-based", process_order_items)]
+
+        self.stdout.write(f"{'lines':>6} {'implementation':<12} {'queries':>8} {'best ms':>10} {'mean ms':>10}")
+        for size in options["sizes"]:
+            for label, implementation in implementations:
+                queries, timings = self.run_case(implementation, size, options["repeat"], options["order_type"])
+                self.stdout.write(f"{size:>6} {label:<12} {queries:>8} "
+                                  f"{min(timings) * 1000:>10.2f} {sum(timings) / len(timings) * 1000:>10.2f}")
+
+    def run_case(self, implementation, size, repeat, order_type):
+        queries = 0
+        timings = []
+        for _ in range(repeat):
+            with transaction.atomic():
+                seller = Sellers.objects.create(name="bench", username="bench-order-items", password="!")
+                products = Products.objects.bulk_create(
+                    Products(seller=seller, name=f"bench-{i}", price=10, quantity=size * repeat, category="bench")
+                    for i in range(size))
+                items = [{"product_id": product.id, "quantity": 1} for product in products]
+
+                executed = []
+                with connection.execute_wrapper(lambda execute, *args: executed.append(1) or execute(*args)):
+                    start = time.perf_counter()
+                    order = Orders.objects.create(seller=seller, order_type=order_type)
+                    implementation(seller=seller, order=order, items=items)
+                    timings.append(time.perf_counter() - start)
+                queries = len(executed)
+
+                transaction.set_rollback(True)
+        return queries, timings
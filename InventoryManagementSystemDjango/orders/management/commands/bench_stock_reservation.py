@@ -0,0 +1,74 @@
+import threading
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction, OperationalError
+
+from core.utils import process_order_items
+from orders.models import Orders
+from products.models import Products
+from users.models import Sellers
+
+
+class Command(BaseCommand):
+    help = "Drive parallel OUTGOING orders at one hot product and report throughput and oversell."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--writers", type=int, nargs="+", default=[1, 4, 16])
+        parser.add_argument("--orders", type=int, default=200, help="Orders placed by each writer.")
+        parser.add_argument("--stock", type=int, default=None,
+                            help="Initial stock; defaults to half the total demand so writers contend for it.")
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'writers':>8} {'orders/s':>10} {'accepted':>9} {'rejected':>9} {'busy':>6} {'oversold':>9}")
+        for writers in options["writers"]:
+            stock = options["stock"]
+            if stock is None:
+                stock = writers * options["orders"] // 2
+            result = self.run_case(writers, options["orders"], stock)
+            self.stdout.write(f"{writers:>8} {result['throughput']:>10.1f} {result['accepted']:>9} "
+                              f"{result['rejected']:>9} {result['busy']:>6} {result['oversold']:>9}")
+
+    def run_case(self, writers, orders_per_writer, stock):
+        seller = Sellers.objects.create(name="bench", username=f"bench-{uuid.uuid4().hex}", password="!")
+        product = Products.objects.create(seller=seller, name="hot", price=1, quantity=stock, category="bench")
+        counts = {"accepted": 0, "rejected": 0, "busy": 0}
+        lock = threading.Lock()
+
+        def writer():
+            local = {"accepted": 0, "rejected": 0, "busy": 0}
+            try:
+                for _ in range(orders_per_writer):
+                    try:
+                        with transaction.atomic():
+                            order = Orders.objects.create(seller=seller, order_type="OUTGOING")
+                            order.total_price = process_order_items(
+                                seller=seller, order=order, items=[{"product_id": product.id, "quantity": 1}])
+                            order.save()
+                        local["accepted"] += 1
+                    except ValueError:
+                        local["rejected"] += 1
+                    except OperationalError:
+                        local["busy"] += 1
+            finally:
+                connection.close()
+                with lock:
+                    for key, value in local.items():
+                        counts[key] += value
+
+        threads = [threading.Thread(target=writer) for _ in range(writers)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        product.refresh_from_db()
+        oversold = max(0, counts["accepted"] - stock) + max(0, -product.quantity)
+        Sellers.objects.filter(id=seller.id).delete()
+
+        return {"throughput": (counts["accepted"] + counts["rejected"]) / elapsed,
+                "oversold": oversold,
+                **counts}
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-18 17:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0003_rename_type_orders_order_type'),
+        ('users', '0003_remove_sellers_is_active_sellers_is_deleted'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='orders',
+            index=models.Index(fields=['seller', '-timestamp', '-id'], name='orders_seller_timestamp_idx'),
+        ),
+    ]
@@ -1,4 +1,6 @@
-from django.db import models
+from django.db import models, connections, router, transaction
+from django.db.models import Sum
+from django.db.models.functions import TruncDay, TruncHour
 from products.models import Products
 from users.models import Sellers
 
@@ -14,6 +16,11 @@ class Orders(models.Model):
     total_price = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["seller", "-timestamp", "-id"], name="orders_seller_timestamp_idx"),
+        ]
+
 
 class OrderItems(models.Model):
     order = models.ForeignKey(Orders, on_delete=models.CASCADE, related_name="items")
@@ -25,3 +32,96 @@ class OrderItems(models.Model):
     def save(self, *args, **kwargs):
         self.total = self.price_at_time * self.quantity
         super().save(*args, **kwargs)
+
+
+class SalesRollup(models.Model):
+    GRANULARITY_CHOICES = (
+        ("hour", "Hour"),
+        ("day", "Day"))
+
+    granularity = models.CharField(max_length=4, choices=GRANULARITY_CHOICES)
+    bucket = models.DateTimeField()
+    seller = models.ForeignKey(Sellers, on_delete=models.CASCADE, related_name="sales_rollups")
+    product = models.ForeignKey(Products, on_delete=models.CASCADE, related_name="sales_rollups")
+    order_type = models.CharField(max_length=10, choices=Orders.ORDER_TYPE_CHOICES)
+    quantity = models.BigIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["seller", "granularity", "bucket", "product", "order_type"],
+                                    name="sales_rollup_bucket_unique"),
+        ]
+
+    @staticmethod
+    def truncate(timestamp, granularity):
+        timestamp = timestamp.replace(minute=0, second=0, microsecond=0)
+        if granularity == "day":
+            timestamp = timestamp.replace(hour=0)
+        return timestamp
+
+    @classmethod
+    def record(cls, order, order_items):
+        totals = {}
+        for order_item in order_items:
+            quantity, revenue = totals.get(order_item.product_id, (0, 0))
+            totals[order_item.product_id] = (quantity + order_item.quantity, revenue + order_item.total)
+
+        rows = [(granularity, cls.truncate(order.timestamp, granularity), product_id, quantity, revenue)
+                for granularity, _ in cls.GRANULARITY_CHOICES
+                for product_id, (quantity, revenue) in totals.items()]
+        if not rows:
+            return
+
+        # Counters are incremented in a single upsert so concurrent orders for the same bucket never lose updates.
+        fields = {field.name: field for field in cls._meta.concrete_fields}
+        connection = connections[router.db_for_write(cls)]
+        table = connection.ops.quote_name(cls._meta.db_table)
+        columns = ["granularity", "bucket", "seller_id", "product_id", "order_type", "quantity", "revenue"]
+        placeholders = ", ".join(["(%s, %s, %s, %s, %s, %s, %s)"] * len(rows))
+        params = []
+        for granularity, bucket, product_id, quantity, revenue in rows:
+            params += [granularity,
+                       fields["bucket"].get_db_prep_value(bucket, connection),
+                       order.seller_id,
+                       product_id,
+                       order.order_type,
+                       quantity,
+                       fields["revenue"].get_db_prep_value(revenue, connection)]
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} ({', '.join(columns)}) VALUES {placeholders} "
+                f"ON CONFLICT (seller_id, granularity, bucket, product_id, order_type) DO UPDATE SET "
+                f"quantity = {table}.quantity + excluded.quantity, "
+                f"revenue = {table}.revenue + excluded.revenue",
+                params)
+
+    @classmethod
+    def rebuild(cls, seller_ids=None, batch_size=5000):
+        order_items = OrderItems.objects.all()
+        rollups = cls.objects.all()
+        if seller_ids is not None:
+            order_items = order_items.filter(order__seller_id__in=seller_ids)
+            rollups = rollups.filter(seller_id__in=seller_ids)
+
+        with transaction.atomic(using=router.db_for_write(cls)):
+            rollups.delete()
+            for granularity, trunc in [("hour", TruncHour), ("day", TruncDay)]:
+                totals = (order_items.annotate(bucket=trunc("order__timestamp"))
+                          .values("order__seller_id", "product_id", "order__order_type", "bucket")
+                          .annotate(quantity=Sum("quantity"), revenue=Sum("total"))
+                          .order_by())
+                batch = []
+                for row in totals.iterator(chunk_size=batch_size):
+                    batch.append(cls(granularity=granularity,
+                                     bucket=row["bucket"],
+                                     seller_id=row["order__seller_id"],
+                                     product_id=row["product_id"],
+                                     order_type=row["order__order_type"],
+                                     quantity=row["quantity"],
+                                     revenue=row["revenue"]))
+                    if len(batch) >= batch_size:
+                        cls.objects.bulk_create(batch)
+                        batch = []
+                cls.objects.bulk_create(batch)
@@ -1,3 +1,216 @@
+import datetime
+import json
+
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from core.utils import create_order, generate_jwt
+from products.models import Products
+from users.models import Sellers
+from .models import Orders, SalesRollup
+
+
+class OrderIndexTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = Sellers.objects.create(name="Seller", username="seller", password="!")
+        Orders.objects.bulk_create(Orders(seller=cls.seller, order_type="INCOMING") for _ in range(100))
+
+    def test_seller_orders_by_time_use_composite_index(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("EXPLAIN QUERY PLAN output is SQLite specific")
+
+        plan = Orders.objects.filter(seller=self.seller).order_by("-timestamp", "-id").explain()
+
+        self.assertIn("orders_seller_timestamp_idx", plan, plan)
+        self.assertNotIn("USE TEMP B-TREE FOR ORDER BY", plan, plan)
+
+
+class OrderBatchTests(TestCase):
+    def setUp(self):
+        self.seller = Sellers.objects.create(name="Seller", username="batch", password="!")
+        self.client.defaults["HTTP_AUTHORIZATION"] = f"Bearer {generate_jwt(self.seller.id)}"
+
+    def test_body_that_is_not_an_object_answers_400(self):
+        response = self.client.post("/orders/batch/", json.dumps([{"order_type": "INCOMING", "items": []}]),
+                                    content_type="application/json")
+
+        self.assertEqual(response.status_code, 400, response.content)
+        self.assertIn("must be an object", json.loads(response.content)["msg"])
+
+
+class StockReservationTests(TestCase):
+    def setUp(self):
+        self.seller = Sellers.objects.create(name="Seller", username="stock", password="!")
+        self.client.defaults["HTTP_AUTHORIZATION"] = f"Bearer {generate_jwt(self.seller.id)}"
+        response = self.client.post("/products/", {"name": "Lamp", "price": "2.00", "quantity": 5,
+                                                   "category": "home"})
+        self.assertEqual(response.status_code, 201, response.content)
+        self.product = Products.objects.get(seller=self.seller)
+
+    def sell(self, *quantities):
+        return self.client.post("/orders/", json.dumps({"order_type": "OUTGOING",
+                                                        "items": [{"product_id": self.product.id, "quantity": quantity}
+                                                                  for quantity in quantities]}),
+                                content_type="application/json")
+
+    def assert_stock(self, expected):
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity, expected)
+
+    def test_oversell_is_rejected_without_creating_the_order(self):
+        response = self.sell(6)
+
+        self.assertEqual(response.status_code, 400, response.content)
+        self.assertIn("Insufficient stock", json.loads(response.content)["msg"])
+        self.assert_stock(5)
+        self.assertFalse(Orders.objects.filter(seller=self.seller).exists())
+
+    def test_duplicate_lines_are_checked_against_their_total(self):
+        response = self.sell(3, 3)
+
+        self.assertEqual(response.status_code, 400, response.content)
+        self.assert_stock(5)
+
+    def test_order_creation_runs_the_same_queries_for_any_number_of_lines(self):
+        for index in range(9):
+            Products.objects.create(seller=self.seller, name=f"Item {index}", price=1, quantity=10, category="home")
+        products = list(Products.objects.filter(seller=self.seller))
+
+        def create(count):
+            return self.client.post("/orders/", json.dumps({"order_type": "INCOMING",
+                                                            "items": [{"product_id": p.id, "quantity": 1}
+                                                                      for p in products[:count]]}),
+                                    content_type="application/json")
+
+        with CaptureQueriesContext(connection) as one_line:
+            self.assertEqual(create(1).status_code, 201)
+        with self.assertNumQueries(len(one_line)):
+            response = create(10)
+
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(len(json.loads(response.content)["data"]["items"]), 10)
+
+    def test_duplicate_lines_reserve_their_total(self):
+        response = self.sell(2, 2)
+
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assert_stock(1)
+        self.assertEqual(float(json.loads(response.content)["data"]["total_price"]), 8.0)
+
+
+class SalesRollupTests(TestCase):
+    def setUp(self):
+        self.seller = Sellers.objects.create(name="Seller", username="rollups", password="!")
+        self.client.defaults["HTTP_AUTHORIZATION"] = f"Bearer {generate_jwt(self.seller.id)}"
+        self.lamp = Products.objects.create(seller=self.seller, name="Lamp", price=2.5, quantity=100, category="home")
+        self.desk = Products.objects.create(seller=self.seller, name="Desk", price=40, quantity=100, category="home")
+        self.today = datetime.datetime.now(datetime.timezone.utc).date().isoformat()
+
+    def order(self, order_type, *lines):
+        create_order(seller=self.seller, order_type=order_type,
+                     items=[{"product_id": product.id, "quantity": quantity} for product, quantity in lines])
+
+    def report(self, **params):
+        response = self.client.get("/orders/reports/sales/", {"start": self.today, "end": self.today, **params})
+        self.assertEqual(response.status_code, 200, response.content)
+        return [(row["product_id"], row["order_type"], row["quantity"], float(row["revenue"]))
+                for row in json.loads(response.content)["data"]["rows"]]
+
+    def test_orders_are_summed_per_bucket_product_and_type(self):
+        self.order("OUTGOING", (self.lamp, 2), (self.lamp, 3), (self.desk, 1))
+        self.order("OUTGOING", (self.lamp, 1))
+        self.order("INCOMING", (self.lamp, 10))
+
+        expected = [(self.lamp.id, "INCOMING", 10, 25.0),
+                    (self.lamp.id, "OUTGOING", 6, 15.0),
+                    (self.desk.id, "OUTGOING", 1, 40.0)]
+        self.assertEqual(self.report(), expected)
+        self.assertEqual(self.report(order_type="OUTGOING", product_id=self.desk.id), expected[2:])
+        self.assertEqual(sorted(self.report(granularity="hour")), sorted(expected))
+
+    def test_rollups_match_a_rebuild_from_order_items(self):
+        self.order("OUTGOING", (self.lamp, 2), (self.desk, 1))
+        self.order("INCOMING", (self.desk, 4))
+        maintained = self.report()
+
+        SalesRollup.objects.all().delete()
+        SalesRollup.rebuild(seller_ids=[self.seller.id])
+
+        self.assertEqual(self.report(), maintained)
+
+    def test_range_longer_than_the_granularity_allows_answers_400(self):
+        response = self.client.get("/orders/reports/sales/", {"start": "2024-01-01", "end": "2024-12-31",
+                                                               "granularity": "hour"})
+
+        self.assertEqual(response.status_code, 400, response.content)
+
+
+class OrderConditionalGetTests(TestCase):
+    def setUp(self):
+        self.seller = Sellers.objects.create(name="Seller", username="etag", password="!")
+        self.client.defaults["HTTP_AUTHORIZATION"] = f"Bearer {generate_jwt(self.seller.id)}"
+        self.product = Products.objects.create(seller=self.seller, name="Lamp", price=2, quantity=50,
+                                               category="home")
+        self.order = create_order(seller=self.seller, order_type="OUTGOING",
+                                  items=[{"product_id": self.product.id, "quantity": 1}])
+
+    def get(self, url, etag):
+        return self.client.get(url, headers={"If-None-Match": etag})
+
+    def test_unchanged_orders_answer_304(self):
+        for url in ["/orders/", f"/orders/{self.order.id}/"]:
+            self.assertEqual(self.get(url, self.client.get(url)["ETag"]).status_code, 304, url)
+
+    def test_new_order_or_renamed_product_invalidates_the_etag(self):
+        etag = self.client.get("/orders/")["ETag"]
+
+        self.client.patch(f"/products/{self.product.id}/", json.dumps({"name": "Desk lamp"}),
+                          content_type="application/json")
+        self.assertEqual(self.get("/orders/", etag).status_code, 200)
+
+        etag = self.client.get("/orders/")["ETag"]
+        create_order(seller=self.seller, order_type="INCOMING", items=[{"product_id": self.product.id,
+                                                                        "quantity": 1}])
+        self.assertEqual(self.get("/orders/", etag).status_code, 200)
+
+    def test_unknown_order_is_not_revalidated(self):
+        etag = self.client.get("/orders/")["ETag"]
+
+        self.assertEqual(self.get(f"/orders/{self.order.id + 1000}/", etag).status_code, 404)
+
+
+class OrderPaginationTests(TestCase):
+    def setUp(self):
+        self.seller = Sellers.objects.create(name="Seller", username="pages", password="!")
+        self.client.defaults["HTTP_AUTHORIZATION"] = f"Bearer {generate_jwt(self.seller.id)}"
+        product = Products.objects.create(seller=self.seller, name="Lamp", price=2, quantity=50, category="home")
+        for _ in range(7):
+            create_order(seller=self.seller, order_type="INCOMING", items=[{"product_id": product.id, "quantity": 1}])
+        # Orders created in the same instant must still page by id without skipping or repeating.
+        tied = Orders.objects.filter(seller=self.seller).order_by("id")[2:5].values_list("id", flat=True)
+        Orders.objects.filter(id__in=list(tied)).update(timestamp=Orders.objects.get(id=tied[0]).timestamp)
+
+    def get(self, **params):
+        return self.client.get("/orders/", params)
+
+    def test_cursor_walks_every_order_once_newest_first(self):
+        seen = []
+        cursor = None
+        while True:
+            data = json.loads(self.get(limit=3, **({"cursor": cursor} if cursor else {})).content)["data"]
+            seen += [order["id"] for order in data["orders"]]
+            cursor = data["next_cursor"]
+            if cursor is None:
+                break
+
+        expected = list(Orders.objects.filter(seller=self.seller).order_by("-timestamp", "-id")
+                        .values_list("id", flat=True))
+        self.assertEqual(seen, expected)
+        self.assertEqual(len(set(seen)), 7)
+
+    def test_invalid_cursor_or_limit_answers_400(self):
+        for params in [{"cursor": "not-a-cursor"}, {"cursor": "Zm9v"}, {"limit": "0"}, {"limit": "ten"}]:
+            self.assertEqual(self.get(**params).status_code, 400, params)
 
-# Create your tests here.
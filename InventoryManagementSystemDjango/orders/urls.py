@@ -1,7 +1,11 @@
 from django.urls import path
-from .views import OrderView
+from .views import OrderView, OrderBatchView, OrderAsyncView, SalesReportView
 
 urlpatterns = [
     path("", OrderView.as_view(), name="orders"),
+    path("batch/", OrderBatchView.as_view(), name="order_batch"),
+    path("reports/sales/", SalesReportView.as_view(), name="sales_report"),
     path("<int:id>/", OrderView.as_view(), name="order_detail"),
+    path("async/", OrderAsyncView.as_view(), name="orders_async"),
+    path("async/<int:id>/", OrderAsyncView.as_view(), name="order_detail_async"),
 ]
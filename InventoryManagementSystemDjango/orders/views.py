@@ -2,16 +2,30 @@ from core.utils import (
     success_response,
     error_response,
     get_user_from_request,
+    validate_order_batch,
     validate_order_type,
-    validate_items,
-    process_order_items
+    create_order,
+    get_orders_for_seller,
+    paginate_orders,
+    split_page,
+    encode_cursor,
+    parse_report_range,
+    get_collection_etag,
+    etag_matches,
+    not_modified_response,
+    with_etag,
+    aget_user_from_request,
+    json_success_response,
+    json_error_response
 )
 from django.db import transaction
+from django.views import View
 from products.models import Products
 from rest_framework import status
 from rest_framework.views import APIView
 
-from .models import Orders
+from core.routers import current_shard
+from .models import Orders, SalesRollup
 from .serializers import OrderSerializer
 
 
@@ -25,15 +39,8 @@ class OrderView(APIView):
         items = request.data.get("items")
 
         try:
-            validate_order_type(order_type)
-            validate_items(items)
-
-            with transaction.atomic():
-                order = Orders.objects.create(seller=seller, order_type=order_type)
-                total_price = process_order_items(seller=seller, order=order, items=items)
-                order.total_price = total_price
-                order.save()
-                serializer = OrderSerializer(order)
+            order = create_order(seller=seller, order_type=order_type, items=items)
+            serializer = OrderSerializer(get_orders_for_seller(seller).get(id=order.id))
 
             return success_response(data=serializer.data,
                                     msg="Order created successfully",
@@ -56,23 +63,178 @@ class OrderView(APIView):
             return error
 
         try:
+            # Orders never change after creation, but their items show the current product name.
+            etag = get_collection_etag(seller, request, "orders", "products")
+
             if id:
-                order = Orders.objects.filter(id=id, seller=seller).first()
+                if etag_matches(request, etag) and Orders.objects.filter(id=id, seller=seller).exists():
+                    return not_modified_response(etag)
+
+                order = get_orders_for_seller(seller).filter(id=id).first()
                 if not order:
                     return error_response(msg="Order not found",
                                           status_code=status.HTTP_404_NOT_FOUND)
 
                 serializer = OrderSerializer(order)
-                return success_response(data=serializer.data,
-                                        msg="Order fetched successfully",
-                                        status_code=status.HTTP_200_OK)
+                return with_etag(success_response(data=serializer.data,
+                                                  msg="Order fetched successfully",
+                                                  status_code=status.HTTP_200_OK), etag)
+
+            if etag_matches(request, etag):
+                return not_modified_response(etag)
+
+            orders = get_orders_for_seller(seller).order_by("-timestamp", "-id")
+            page, limit = paginate_orders(orders, request.query_params)
+            orders, next_cursor = split_page(list(page), limit,
+                                             cursor=lambda o: encode_cursor(o.timestamp.isoformat(), o.id))
 
-            orders = Orders.objects.filter(seller=seller)
             serializer = OrderSerializer(orders, many=True)
-            return success_response(data=serializer.data,
-                                    msg="Orders fetched successfully",
+            return with_etag(success_response(data={"orders": serializer.data,
+                                                    "next_cursor": next_cursor},
+                                              msg="Orders fetched successfully",
+                                              status_code=status.HTTP_200_OK), etag)
+
+        except ValueError as e:
+            return error_response(msg=str(e),
+                                  status_code=status.HTTP_400_BAD_REQUEST)
+
+        except Exception:
+            return error_response(msg="Internal Server Error",
+                                  status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class OrderBatchView(APIView):
+    def post(self, request):
+        seller, error = get_user_from_request(request)
+        if error:
+            return error
+
+        try:
+            if not isinstance(request.data, dict):
+                raise ValueError("Request body must be an object with an orders list.")
+
+            orders = request.data.get("orders")
+            atomic = request.data.get("atomic") is True
+            validate_order_batch(orders)
+
+            results = []
+            with transaction.atomic(using=current_shard()):
+                for index, payload in enumerate(orders):
+                    try:
+                        if not isinstance(payload, dict):
+                            raise ValueError("Each order must be an object.")
+
+                        order = create_order(seller=seller,
+                                             order_type=payload.get("order_type"),
+                                             items=payload.get("items"))
+                        results.append({"index": index, "success": True, "id": order.id})
+
+                    except (ValueError, Products.DoesNotExist) as e:
+                        if atomic:
+                            raise ValueError(f"Order {index}: {e}")
+                        results.append({"index": index, "success": False, "msg": str(e)})
+
+            created = get_orders_for_seller(seller).filter(id__in=[r["id"] for r in results if r["success"]])
+            serialized = {order["id"]: order for order in OrderSerializer(created, many=True).data}
+            for result in results:
+                if result["success"]:
+                    result["data"] = serialized[result.pop("id")]
+
+            return success_response(data={"results": results},
+                                    msg="Orders processed successfully",
+                                    status_code=status.HTTP_201_CREATED)
+
+        except ValueError as e:
+            return error_response(msg=str(e),
+                                  status_code=status.HTTP_400_BAD_REQUEST)
+
+        except Exception:
+            return error_response(msg="Internal Server Error",
+                                  status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class OrderAsyncView(View):
+    async def get(self, request, id=None):
+        seller, error = await aget_user_from_request(request)
+        if error:
+            return error
+
+        try:
+            if id:
+                order = await get_orders_for_seller(seller).filter(id=id).afirst()
+                if not order:
+                    return json_error_response(msg="Order not found",
+                                               status_code=status.HTTP_404_NOT_FOUND)
+
+                serializer = OrderSerializer(order)
+                return json_success_response(data=serializer.data,
+                                             msg="Order fetched successfully",
+                                             status_code=status.HTTP_200_OK)
+
+            orders = get_orders_for_seller(seller).order_by("-timestamp", "-id")
+            page, limit = paginate_orders(orders, request.GET)
+            orders, next_cursor = split_page([o async for o in page], limit,
+                                             cursor=lambda o: encode_cursor(o.timestamp.isoformat(), o.id))
+
+            serializer = OrderSerializer(orders, many=True)
+            return json_success_response(data={"orders": serializer.data,
+                                               "next_cursor": next_cursor},
+                                         msg="Orders fetched successfully",
+                                         status_code=status.HTTP_200_OK)
+
+        except ValueError as e:
+            return json_error_response(msg=str(e),
+                                       status_code=status.HTTP_400_BAD_REQUEST)
+
+        except Exception:
+            return json_error_response(msg="Internal Server Error",
+                                       status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class SalesReportView(APIView):
+    def get(self, request):
+        seller, error = get_user_from_request(request)
+        if error:
+            return error
+
+        try:
+            granularity = request.query_params.get("granularity", "day")
+            start, end = parse_report_range(start=request.query_params.get("start"),
+                                            end=request.query_params.get("end"),
+                                            granularity=granularity)
+
+            rollups = SalesRollup.objects.filter(seller=seller,
+                                                 granularity=granularity,
+                                                 bucket__gte=start,
+                                                 bucket__lt=end)
+
+            order_type = request.query_params.get("order_type")
+            if order_type:
+                validate_order_type(order_type)
+                rollups = rollups.filter(order_type=order_type)
+
+            product_id = request.query_params.get("product_id")
+            if product_id:
+                if not product_id.isdigit():
+                    raise ValueError("Product id must be a number")
+                rollups = rollups.filter(product_id=int(product_id))
+
+            rows = [{"bucket": row["bucket"],
+                     "product_id": row["product_id"],
+                     "order_type": row["order_type"],
+                     "quantity": row["quantity"],
+                     "revenue": row["revenue"]}
+                    for row in rollups.order_by("bucket", "product_id", "order_type")
+                    .values("bucket", "product_id", "order_type", "quantity", "revenue")]
+
+            return success_response(data={"granularity": granularity, "rows": rows},
+                                    msg="Sales report fetched successfully",
                                     status_code=status.HTTP_200_OK)
 
+        except ValueError as e:
+            return error_response(msg=str(e),
+                                  status_code=status.HTTP_400_BAD_REQUEST)
+
         except Exception:
             return error_response(msg="Internal Server Error",
                                   status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -0,0 +1,42 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.routers import use_shard, reset_shard
+from products.models import Products, StockSnapshot
+
+
+class Command(BaseCommand):
+    help = ("Compare every product's quantity with the stock rebuilt from its latest snapshot and the ledger "
+            "movements after it, and list the products that disagree.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seller", type=int, nargs="+", dest="sellers",
+                            help="Only check these seller ids (default: all sellers).")
+        parser.add_argument("--show", type=int, default=20, help="Mismatches to print.")
+
+    def handle(self, *args, **options):
+        as_of = datetime.datetime.now(datetime.timezone.utc)
+        checked = 0
+        mismatches = []
+        for alias in getattr(settings, "SHARD_DATABASES", ["default"]):
+            token = use_shard(alias)
+            try:
+                products = Products.objects.all()
+                if options["sellers"]:
+                    products = products.filter(seller_id__in=options["sellers"])
+                for product in StockSnapshot.annotate_stock(products.only("id", "seller_id", "quantity"), as_of):
+                    checked += 1
+                    stock = StockSnapshot.stock(product)
+                    if stock != product.quantity:
+                        mismatches.append((alias, product.seller_id, product.id, product.quantity, stock))
+            finally:
+                reset_shard(token)
+
+        for alias, seller_id, product_id, quantity, stock in mismatches[:options["show"]]:
+            self.stdout.write(f"{alias}: seller {seller_id} product {product_id} has quantity {quantity}, "
+                              f"ledger says {'nothing' if stock is None else stock}")
+        if mismatches:
+            raise CommandError(f"{len(mismatches)} of {checked} products disagree with the stock ledger.")
+        self.stdout.write(self.style.SUCCESS(f"All {checked} products match the stock ledger."))
@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.routers import use_shard, reset_shard
+
+from products.models import InventorySummary
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per-seller inventory summary from the products table."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seller", type=int, nargs="+", dest="sellers",
+                            help="Only rebuild these seller ids (default: all sellers).")
+
+    def handle(self, *args, **options):
+        for alias in getattr(settings, "SHARD_DATABASES", ["default"]):
+            token = use_shard(alias)
+            try:
+                InventorySummary.rebuild(seller_ids=options["sellers"])
+            finally:
+                reset_shard(token)
+        self.stdout.write(self.style.SUCCESS("Inventory summary rebuilt."))
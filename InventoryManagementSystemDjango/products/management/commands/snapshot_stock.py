@@ -0,0 +1,30 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.routers import use_shard, reset_shard
+from products.models import StockSnapshot
+
+
+class Command(BaseCommand):
+    help = ("Snapshot the stock of every product with ledger movements since its last snapshot, so stock "
+            "lookups only replay a short tail. Meant to run periodically, e.g. hourly from cron.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seller", type=int, nargs="+", dest="sellers",
+                            help="Only snapshot these seller ids (default: all sellers).")
+        parser.add_argument("--lag", type=int, default=getattr(settings, "STOCK_SNAPSHOT_LAG_SECONDS", 60),
+                            help="Snapshot the stock as of this many seconds ago, so movements of transactions "
+                                 "still in flight are not missed.")
+
+    def handle(self, *args, **options):
+        as_of = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(seconds=options["lag"])
+        taken = 0
+        for alias in getattr(settings, "SHARD_DATABASES", ["default"]):
+            token = use_shard(alias)
+            try:
+                taken += StockSnapshot.take(as_of, seller_ids=options["sellers"])
+            finally:
+                reset_shard(token)
+        self.stdout.write(self.style.SUCCESS(f"Took {taken} stock snapshots as of {as_of.isoformat()}."))
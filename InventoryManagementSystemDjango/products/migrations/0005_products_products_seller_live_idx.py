@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-18 17:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0004_alter_products_price'),
+        ('users', '0003_remove_sellers_is_active_sellers_is_deleted'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='products',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['seller', 'id'], name='products_seller_live_idx'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 6.0.2 on 2026-10-18 17:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def build_summaries(apps, schema_editor):
+    Products = apps.get_model('products', 'Products')
+    InventorySummary = apps.get_model('products', 'InventorySummary')
+    threshold = getattr(settings, 'LOW_STOCK_THRESHOLD', 10)
+    db_alias = schema_editor.connection.alias
+
+    totals = (Products.objects.using(db_alias).filter(is_deleted=False)
+              .values('seller_id')
+              .annotate(units=models.Sum('quantity'),
+                        value=models.Sum(models.F('price') * models.F('quantity'),
+                                         output_field=models.DecimalField(max_digits=20, decimal_places=2)),
+                        skus=models.Count('id'),
+                        low_stock=models.Count('id', filter=models.Q(quantity__lte=threshold)))
+              .order_by())
+    InventorySummary.objects.using(db_alias).bulk_create(InventorySummary(seller_id=row['seller_id'],
+                                                                          stock_units=row['units'],
+                                                                          stock_value=row['value'],
+                                                                          sku_count=row['skus'],
+                                                                          low_stock_count=row['low_stock'])
+                                                         for row in totals)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_products_products_seller_live_idx'),
+        ('users', '0003_remove_sellers_is_active_sellers_is_deleted'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventorySummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stock_units', models.BigIntegerField(default=0)),
+                ('stock_value', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('sku_count', models.IntegerField(default=0)),
+                ('low_stock_count', models.IntegerField(default=0)),
+                ('seller', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='inventory_summary', to='users.sellers')),
+            ],
+        ),
+        migrations.RunPython(build_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 6.0.2 on 2026-10-18 17:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def extract_trigrams(text):
+    trigrams = set()
+    for word in ''.join(c if c.isalnum() else ' ' for c in text.lower()).split():
+        padded = f'  {word} '
+        trigrams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return trigrams
+
+
+def index_products(apps, schema_editor):
+    Products = apps.get_model('products', 'Products')
+    ProductTrigram = apps.get_model('products', 'ProductTrigram')
+    db_alias = schema_editor.connection.alias
+
+    batch = []
+    for product in Products.objects.using(db_alias).filter(is_deleted=False).iterator(chunk_size=2000):
+        batch.extend(ProductTrigram(seller_id=product.seller_id, product_id=product.id, trigram=trigram)
+                     for trigram in extract_trigrams(f'{product.name} {product.category}'))
+        if len(batch) >= 5000:
+            ProductTrigram.objects.using(db_alias).bulk_create(batch)
+            batch = []
+    ProductTrigram.objects.using(db_alias).bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0006_inventorysummary'),
+        ('users', '0003_remove_sellers_is_active_sellers_is_deleted'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductTrigram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigram', models.CharField(max_length=3)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trigrams', to='products.products')),
+                ('seller', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='users.sellers')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['seller', 'trigram', 'product'], name='product_trigram_lookup_idx')],
+            },
+        ),
+        migrations.RunPython(index_products, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-18 17:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0007_producttrigram'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='products',
+            name='image_variants',
+            field=models.JSONField(default=dict),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-18 17:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0008_products_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='products',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 6.0.2 on 2026-10-18 17:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def open_ledger(apps, schema_editor):
+    # Existing stock has no movements behind it, so the ledger starts from a snapshot of today's quantities.
+    Products = apps.get_model('products', 'Products')
+    StockSnapshot = apps.get_model('products', 'StockSnapshot')
+    db_alias = schema_editor.connection.alias
+    now = timezone.now()
+
+    batch = []
+    for seller_id, product_id, quantity in (Products.objects.using(db_alias)
+                                            .values_list('seller_id', 'id', 'quantity')
+                                            .iterator(chunk_size=2000)):
+        batch.append(StockSnapshot(seller_id=seller_id, product_id=product_id, quantity=quantity, taken_at=now))
+        if len(batch) >= 5000:
+            StockSnapshot.objects.using(db_alias).bulk_create(batch)
+            batch = []
+    StockSnapshot.objects.using(db_alias).bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0005_salesrollup'),
+        ('products', '0009_products_version'),
+        ('users', '0003_remove_sellers_is_active_sellers_is_deleted'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('delta', models.IntegerField()),
+                ('reason', models.CharField(choices=[('CREATED', 'Created'), ('INCOMING', 'Incoming order'), ('OUTGOING', 'Outgoing order'), ('ADJUSTMENT', 'Adjustment')], max_length=10)),
+                ('timestamp', models.DateTimeField(auto_now_add=True)),
+                ('order', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='stock_movements', to='orders.orders')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_movements', to='products.products')),
+                ('seller', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='users.sellers')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product', 'timestamp'], name='stock_movement_product_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField()),
+                ('taken_at', models.DateTimeField()),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_snapshots', to='products.products')),
+                ('seller', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='users.sellers')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product', '-taken_at'], name='stock_snapshot_product_idx')],
+            },
+        ),
+        migrations.RunPython(open_ledger, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,11 @@
-from django.db import models
+import datetime
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import models, router, transaction, IntegrityError
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from core.models import ResourceVersion
 from users.models import Sellers
 
 
@@ -11,8 +18,230 @@ class Products(models.Model):
     expiry = models.DateField(null=True)
     category = models.CharField(max_length=120)
     image = models.ImageField(upload_to='products', null=True, default=None)
+    image_variants = models.JSONField(default=dict)
+    version = models.PositiveIntegerField(default=1)
     is_deleted = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["seller", "id"],
+                         condition=models.Q(is_deleted=False),
+                         name="products_seller_live_idx"),
+        ]
+
     def delete(self, using=None, keep_parents=False):
-        self.is_deleted = True
-        self.save()
+        if self.is_deleted:
+            return
+
+        alias = router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=alias):
+            # Stock moves with F() updates, so this instance's quantity may be stale; use the locked row.
+            current = (type(self).objects.using(alias).select_for_update()
+                       .only("quantity", "price", "is_deleted").get(pk=self.pk))
+            if current.is_deleted:
+                return
+
+            self.is_deleted = True
+            self.version = models.F("version") + 1
+            self.save(using=alias, update_fields=["is_deleted", "version"])
+            ResourceVersion.bump(self.seller_id, "products")
+            InventorySummary.record(self.seller_id, [((current.quantity, current.price), None)])
+            ProductTrigram.objects.filter(product=self).delete()
+
+
+class InventorySummary(models.Model):
+    seller = models.OneToOneField(Sellers, on_delete=models.CASCADE, related_name="inventory_summary")
+    stock_units = models.BigIntegerField(default=0)
+    stock_value = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    sku_count = models.IntegerField(default=0)
+    low_stock_count = models.IntegerField(default=0)
+
+    @staticmethod
+    def contribution(state):
+        if state is None:
+            return (0, Decimal(0), 0, 0)
+
+        quantity, price = state
+        low_stock = 1 if quantity <= getattr(settings, "LOW_STOCK_THRESHOLD", 10) else 0
+        return (quantity, Decimal(str(price)) * quantity, 1, low_stock)
+
+    @classmethod
+    def record(cls, seller_id, changes):
+        """
+        Apply (before, after) product states to the seller's summary.
+
+        Each state is a (quantity, price) tuple for a live product, or None when
+        the product does not exist or is deleted on that side of the change.
+        """
+        deltas = [0, Decimal(0), 0, 0]
+        for before, after in changes:
+            old = cls.contribution(before)
+            new = cls.contribution(after)
+            for index in range(4):
+                deltas[index] += new[index] - old[index]
+
+        units, value, skus, low_stock = deltas
+        if not any(deltas):
+            return
+
+        updated = cls.objects.filter(seller_id=seller_id).update(stock_units=models.F("stock_units") + units,
+                                                                 stock_value=models.F("stock_value") + value,
+                                                                 sku_count=models.F("sku_count") + skus,
+                                                                 low_stock_count=models.F("low_stock_count") + low_stock)
+        if updated:
+            return
+
+        try:
+            with transaction.atomic(using=router.db_for_write(cls)):
+                cls.objects.create(seller_id=seller_id, stock_units=units, stock_value=value,
+                                   sku_count=skus, low_stock_count=low_stock)
+        except IntegrityError:
+            cls.record(seller_id, changes)
+
+    @classmethod
+    def rebuild(cls, seller_ids=None):
+        threshold = getattr(settings, "LOW_STOCK_THRESHOLD", 10)
+        products = Products.objects.filter(is_deleted=False)
+        summaries = cls.objects.all()
+        if seller_ids is not None:
+            products = products.filter(seller_id__in=seller_ids)
+            summaries = summaries.filter(seller_id__in=seller_ids)
+
+        totals = (products.values("seller_id")
+                  .annotate(units=models.Sum("quantity"),
+                            value=models.Sum(models.F("price") * models.F("quantity"),
+                                             output_field=models.DecimalField(max_digits=20, decimal_places=2)),
+                            skus=models.Count("id"),
+                            low_stock=models.Count("id", filter=models.Q(quantity__lte=threshold)))
+                  .order_by())
+
+        with transaction.atomic(using=router.db_for_write(cls)):
+            summaries.delete()
+            cls.objects.bulk_create(cls(seller_id=row["seller_id"],
+                                        stock_units=row["units"],
+                                        stock_value=row["value"],
+                                        sku_count=row["skus"],
+                                        low_stock_count=row["low_stock"])
+                                    for row in totals)
+
+
+class ProductTrigram(models.Model):
+    seller = models.ForeignKey(Sellers, on_delete=models.CASCADE, related_name="+")
+    product = models.ForeignKey(Products, on_delete=models.CASCADE, related_name="trigrams")
+    trigram = models.CharField(max_length=3)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["seller", "trigram", "product"], name="product_trigram_lookup_idx"),
+        ]
+
+    @staticmethod
+    def extract(text):
+        """Padded, lower-cased word trigrams in the style of pg_trgm."""
+        trigrams = set()
+        for word in "".join(c if c.isalnum() else " " for c in text.lower()).split():
+            padded = f"  {word} "
+            trigrams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+        return trigrams
+
+    @classmethod
+    def index(cls, products):
+        products = [product for product in products if not product.is_deleted]
+        cls.objects.filter(product__in=products).delete()
+        cls.objects.bulk_create((cls(seller_id=product.seller_id, product_id=product.id, trigram=trigram)
+                                 for product in products
+                                 for trigram in cls.extract(f"{product.name} {product.category}")),
+                                batch_size=5000)
+
+
+class StockMovement(models.Model):
+    """
+    Append-only record of every change to Products.quantity, written in the transaction that makes the change.
+    Rows are never updated or deleted; a correction is another movement.
+    """
+
+    REASON_CHOICES = (
+        ("CREATED", "Created"),
+        ("INCOMING", "Incoming order"),
+        ("OUTGOING", "Outgoing order"),
+        ("ADJUSTMENT", "Adjustment"))
+
+    seller = models.ForeignKey(Sellers, on_delete=models.CASCADE, related_name="+")
+    product = models.ForeignKey(Products, on_delete=models.CASCADE, related_name="stock_movements")
+    delta = models.IntegerField()
+    reason = models.CharField(max_length=10, choices=REASON_CHOICES)
+    order = models.ForeignKey("orders.Orders", on_delete=models.CASCADE, null=True, related_name="stock_movements")
+    timestamp = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["product", "timestamp"], name="stock_movement_product_idx"),
+        ]
+
+    @classmethod
+    def record(cls, seller_id, reason, deltas, order=None):
+        """Append one movement per product in deltas, a {product_id: delta} dict. Zero deltas are skipped."""
+        cls.objects.bulk_create(cls(seller_id=seller_id, product_id=product_id, delta=delta, reason=reason,
+                                    order=order)
+                                for product_id, delta in deltas.items() if delta)
+
+
+class StockSnapshot(models.Model):
+    """
+    A product's stock at taken_at, covering every movement up to and including that moment. Stock at a later
+    time is the snapshot plus the movements after it. Products that predate the ledger start with an opening
+    snapshot of their quantity at the time.
+    """
+
+    seller = models.ForeignKey(Sellers, on_delete=models.CASCADE, related_name="+")
+    product = models.ForeignKey(Products, on_delete=models.CASCADE, related_name="stock_snapshots")
+    quantity = models.IntegerField()
+    taken_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["product", "-taken_at"], name="stock_snapshot_product_idx"),
+        ]
+
+    @classmethod
+    def annotate_stock(cls, products, as_of):
+        """
+        Annotate products with snapshot_quantity, from the latest snapshot at or before as_of, and tail_delta,
+        the sum of the movements after that snapshot up to as_of. Either is None when there are no such rows.
+        """
+        snapshots = cls.objects.filter(product=OuterRef("pk"), taken_at__lte=as_of).order_by("-taken_at")
+        since = Coalesce(OuterRef("snapshot_taken_at"),
+                         models.Value(datetime.datetime.min.replace(tzinfo=datetime.timezone.utc)),
+                         output_field=models.DateTimeField())
+        tail = (StockMovement.objects.filter(product=OuterRef("pk"), timestamp__gt=since, timestamp__lte=as_of)
+                .order_by().values("product").annotate(total=Sum("delta")).values("total"))
+        return (products.annotate(snapshot_quantity=Subquery(snapshots.values("quantity")[:1]),
+                                  snapshot_taken_at=Subquery(snapshots.values("taken_at")[:1]))
+                .annotate(tail_delta=Subquery(tail)))
+
+    @staticmethod
+    def stock(product):
+        """Stock of an annotate_stock() row, or None when the ledger has no history for it by then."""
+        if product.snapshot_quantity is None and product.tail_delta is None:
+            return None
+        return (product.snapshot_quantity or 0) + (product.tail_delta or 0)
+
+    @classmethod
+    def stock_as_of(cls, product_ids, as_of):
+        products = cls.annotate_stock(Products.objects.filter(id__in=product_ids), as_of)
+        return {product.id: cls.stock(product) for product in products}
+
+    @classmethod
+    def take(cls, as_of, seller_ids=None, batch_size=5000):
+        """Snapshot every product with movements since its latest snapshot. Returns the number taken."""
+        products = Products.objects.all()
+        if seller_ids is not None:
+            products = products.filter(seller_id__in=seller_ids)
+
+        rows = (cls.annotate_stock(products, as_of).filter(tail_delta__isnull=False)
+                .values_list("id", "seller_id", "snapshot_quantity", "tail_delta"))
+        snapshots = [cls(seller_id=seller_id, product_id=product_id, quantity=(quantity or 0) + tail,
+                         taken_at=as_of)
+                     for product_id, seller_id, quantity, tail in rows]
+        cls.objects.bulk_create(snapshots, batch_size=batch_size)
+        return len(snapshots)
@@ -1,3 +1,407 @@
+import datetime
+import json
+from unittest import mock, skipUnless
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import TestCase
 
-# Create your tests here.
+from core.models import SellerShard
+from core.renderers import dumps
+from core.routers import copy_seller_to_shard, invalidate_shard, seller_shard
+from core.utils import create_order, generate_jwt, import_products, iter_import_rows, ProductImportError
+from users.models import Sellers
+from .models import InventorySummary, Products, StockMovement, StockSnapshot
+
+
+class ProductIndexTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = Sellers.objects.create(name="Seller", username="seller", password="!")
+        Products.objects.bulk_create(
+            Products(seller=cls.seller, name=f"Product {i}", price=1, quantity=1, category="General",
+                     is_deleted=i % 10 == 0)
+            for i in range(100))
+
+    def test_live_products_for_seller_use_partial_index(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("EXPLAIN QUERY PLAN output is SQLite specific")
+
+        plan = Products.objects.filter(seller=self.seller, is_deleted=False).order_by("id").explain()
+
+        self.assertIn("products_seller_live_idx", plan, plan)
+
+
+@skipUnless(len(settings.SHARD_DATABASES) > 1, "Set DB_SHARDS to run the sharding tests")
+class ShardRoutingTests(TestCase):
+    # Every shard, but not the replica mirrors, which share default's test database.
+    databases = set(settings.SHARD_DATABASES)
+
+    def setUp(self):
+        self.shard = settings.SHARD_DATABASES[1]
+        self.seller = Sellers.objects.create(name="Seller", username="sharded", password="!")
+        copy_seller_to_shard(self.seller, self.shard)
+        SellerShard.objects.create(seller=self.seller, alias=self.shard)
+        invalidate_shard(self.seller.id)
+        self.addCleanup(invalidate_shard, self.seller.id)
+        self.client.defaults["HTTP_AUTHORIZATION"] = f"Bearer {generate_jwt(self.seller.id)}"
+
+    def create_product(self, name="Lamp", quantity=5):
+        response = self.client.post("/products/", {"name": name, "price": "2.50", "quantity": quantity,
+                                                   "category": "home"})
+        self.assertEqual(response.status_code, 201, response.content)
+
+    def test_products_are_written_to_the_seller_shard(self):
+        self.create_product()
+
+        self.assertEqual(Products.objects.using(self.shard).filter(seller=self.seller).count(), 1)
+        self.assertFalse(Products.objects.using("default").filter(seller=self.seller).exists())
+
+    def test_paged_and_streamed_lists_read_the_seller_shard(self):
+        for index in range(3):
+            self.create_product(name=f"Lamp {index}")
+
+        page = json.loads(self.client.get("/products/").content)["data"]["products"]
+        ndjson = b"".join(self.client.get("/products/?stream=ndjson").streaming_content).decode().splitlines()
+        streamed = json.loads(b"".join(self.client.get("/products/?stream=json").streaming_content))
+
+        self.assertEqual(len(page), 3)
+        self.assertEqual(len(ndjson), 3)
+        self.assertEqual(len(streamed["data"]["products"]), 3)
+
+    async def test_async_list_reads_the_seller_shard(self):
+        await sync_to_async(self.create_product)()
+
+        response = await self.async_client.get("/products/async/",
+                                               headers={"Authorization": f"Bearer {generate_jwt(self.seller.id)}"})
+
+        self.assertEqual(len(json.loads(response.content)["data"]["products"]), 1)
+
+    def test_move_to_an_earlier_shard_is_refused_on_sqlite(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("Only SQLite numbers new rows after the largest id")
+        self.create_product()
+
+        with self.assertRaisesMessage(CommandError, "ids beyond the id block of default"):
+            call_command("move_seller", self.seller.id, "default", no_wait=True)
+
+        self.assertEqual(SellerShard.objects.get(seller=self.seller).alias, self.shard)
+        self.assertFalse(Products.objects.using("default").filter(seller=self.seller).exists())
+
+    def test_background_work_picks_the_shard_by_seller(self):
+        self.create_product()
+
+        with seller_shard(self.seller.id):
+            self.assertEqual(Products.objects.filter(seller=self.seller).count(), 1)
+        self.assertEqual(Products.objects.filter(seller=self.seller).count(), 0)
+
+
+class StockLedgerTests(TestCase):
+    def setUp(self):
+        self.seller = Sellers.objects.create(name="Seller", username="ledger", password="!")
+        self.client.defaults["HTTP_AUTHORIZATION"] = f"Bearer {generate_jwt(self.seller.id)}"
+        response = self.client.post("/products/", {"name": "Lamp", "price": "2.00", "quantity": 20,
+                                                   "category": "home"})
+        self.assertEqual(response.status_code, 201, response.content)
+        self.product = Products.objects.get(seller=self.seller)
+
+    def now(self):
+        return datetime.datetime.now(datetime.timezone.utc)
+
+    def stale_product_after_sale(self, quantity=5):
+        stale = Products.objects.get(id=self.product.id)
+        create_order(seller=self.seller, order_type="OUTGOING", items=[{"product_id": self.product.id,
+                                                                        "quantity": quantity}])
+        return stale
+
+    def assert_stock(self, expected):
+        self.product.refresh_from_db()
+        summary = InventorySummary.objects.get(seller=self.seller)
+        self.assertEqual(self.product.quantity, expected)
+        self.assertEqual(summary.stock_units, expected)
+        self.assertEqual(StockSnapshot.stock_as_of([self.product.id], self.now())[self.product.id], expected)
+
+    def test_name_only_patch_keeps_a_concurrent_stock_change(self):
+        stale = self.stale_product_after_sale()
+
+        with mock.patch("products.views.get_product_for_seller", return_value=stale):
+            response = self.client.patch(f"/products/{self.product.id}/", json.dumps({"name": "Desk lamp"}),
+                                         content_type="application/json")
+
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assert_stock(15)
+
+    def test_quantity_patch_records_the_delta_from_the_current_stock(self):
+        stale = self.stale_product_after_sale()
+
+        with mock.patch("products.views.get_product_for_seller", return_value=stale):
+            self.client.patch(f"/products/{self.product.id}/", json.dumps({"quantity": 30}),
+                              content_type="application/json")
+
+        self.assert_stock(30)
+        adjustment = StockMovement.objects.get(product=self.product, reason="ADJUSTMENT")
+        self.assertEqual(adjustment.delta, 15)
+
+    def test_delete_removes_the_current_stock_from_the_summary(self):
+        stale = self.stale_product_after_sale()
+
+        stale.delete()
+
+        summary = InventorySummary.objects.get(seller=self.seller)
+        self.assertEqual((summary.stock_units, summary.sku_count), (0, 0))
+        self.assertEqual(Products.objects.get(id=self.product.id).quantity, 15)
+
+    def test_stock_as_of_replays_the_tail_after_the_latest_snapshot(self):
+        before_sale = self.now()
+        self.stale_product_after_sale(quantity=3)
+        after_sale = self.now()
+        StockSnapshot.take(after_sale)
+        create_order(seller=self.seller, order_type="INCOMING", items=[{"product_id": self.product.id,
+                                                                        "quantity": 10}])
+
+        stock = lambda as_of: StockSnapshot.stock_as_of([self.product.id], as_of)[self.product.id]
+        self.assertIsNone(stock(before_sale - datetime.timedelta(days=1)))
+        self.assertEqual(stock(before_sale), 20)
+        self.assertEqual(stock(after_sale), 17)
+        self.assertEqual(stock(self.now()), 27)
+        self.assertEqual(StockSnapshot.objects.get(product=self.product).quantity, 17)
+
+    def test_stock_endpoint_reads_the_ledger(self):
+        self.stale_product_after_sale(quantity=4)
+
+        response = self.client.get(f"/products/{self.product.id}/stock/")
+        early = self.client.get(f"/products/{self.product.id}/stock/?as_of=2000-01-01")
+
+        self.assertEqual(json.loads(response.content)["data"]["quantity"], 16)
+        self.assertEqual(early.status_code, 404)
+
+    def test_stock_endpoint_reports_unexpected_errors_as_500(self):
+        with mock.patch.object(StockSnapshot, "stock_as_of", side_effect=RuntimeError("ledger unavailable")):
+            response = self.client.get(f"/products/{self.product.id}/stock/")
+
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(json.loads(response.content)["msg"], "Internal Server Error")
+
+
+class InventorySummaryTests(TestCase):
+    def setUp(self):
+        self.seller = Sellers.objects.create(name="Seller", username="summary", password="!")
+        self.client.defaults["HTTP_AUTHORIZATION"] = f"Bearer {generate_jwt(self.seller.id)}"
+
+    def create_product(self, quantity, price):
+        response = self.client.post("/products/", {"name": "Lamp", "price": price, "quantity": quantity,
+                                                   "category": "home"})
+        self.assertEqual(response.status_code, 201, response.content)
+        return Products.objects.filter(seller=self.seller).latest("id")
+
+    def summary(self):
+        data = json.loads(self.client.get("/products/summary/").content)["data"]
+        return (data["stock_units"], float(data["stock_value"]), data["sku_count"], data["low_stock_count"])
+
+    def test_summary_follows_creates_orders_edits_and_deletes(self):
+        lamp = self.create_product(quantity=20, price="2.50")
+        desk = self.create_product(quantity=3, price="10.00")
+        self.assertEqual(self.summary(), (23, 80.0, 2, 1))
+
+        create_order(seller=self.seller, order_type="OUTGOING", items=[{"product_id": lamp.id, "quantity": 15}])
+        self.assertEqual(self.summary(), (8, 42.5, 2, 2))
+
+        self.client.patch(f"/products/{desk.id}/", json.dumps({"price": "20.00", "quantity": 30}),
+                          content_type="application/json")
+        self.assertEqual(self.summary(), (35, 612.5, 2, 1))
+
+        self.client.delete(f"/products/{lamp.id}/")
+        self.assertEqual(self.summary(), (30, 600.0, 1, 0))
+
+    def test_summary_matches_a_rebuild(self):
+        lamp = self.create_product(quantity=20, price="2.50")
+        self.create_product(quantity=3, price="10.00")
+        create_order(seller=self.seller, order_type="INCOMING", items=[{"product_id": lamp.id, "quantity": 5}])
+        maintained = self.summary()
+
+        InventorySummary.objects.filter(seller=self.seller).delete()
+        InventorySummary.rebuild(seller_ids=[self.seller.id])
+
+        self.assertEqual(self.summary(), maintained)
+
+    def test_seller_without_products_gets_an_empty_summary(self):
+        self.assertEqual(self.summary(), (0, 0.0, 0, 0))
+
+
+class ProductSearchTests(TestCase):
+    def setUp(self):
+        self.seller = Sellers.objects.create(name="Seller", username="search", password="!")
+        self.client.defaults["HTTP_AUTHORIZATION"] = f"Bearer {generate_jwt(self.seller.id)}"
+        self.ids = {name: self.create_product(name, category) for name, category in [("Desk lamp", "lighting"),
+                                                                                     ("Lamp shade", "lighting"),
+                                                                                     ("Lampshade", "decor"),
+                                                                                     ("Office chair", "furniture")]}
+
+    def create_product(self, name, category):
+        response = self.client.post("/products/", {"name": name, "price": "5.00", "quantity": 5,
+                                                   "category": category})
+        self.assertEqual(response.status_code, 201, response.content)
+        return json.loads(response.content)["data"]["id"]
+
+    def search(self, **params):
+        response = self.client.get("/products/search/", params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return json.loads(response.content)["data"]
+
+    def names(self, **params):
+        return [product["name"] for product in self.search(**params)["products"]]
+
+    def test_prefix_matches_rank_before_matches_inside_the_name(self):
+        self.assertEqual(self.names(q="lamp"), ["Lamp shade", "Lampshade", "Desk lamp"])
+
+    def test_search_tolerates_a_typo(self):
+        self.assertEqual(sorted(self.names(q="lanp")), ["Desk lamp", "Lamp shade", "Lampshade"])
+
+    def test_category_filter_keeps_the_facets_of_every_match(self):
+        result = self.search(q="lamp", category="decor")
+
+        self.assertEqual([product["name"] for product in result["products"]], ["Lampshade"])
+        self.assertEqual(result["facets"]["category"], [{"value": "lighting", "count": 2},
+                                                        {"value": "decor", "count": 1}])
+
+    def test_renamed_deleted_and_foreign_products_follow_the_index(self):
+        self.client.patch(f"/products/{self.ids['Office chair']}/", json.dumps({"name": "Reading lamp"}),
+                          content_type="application/json")
+        self.client.delete(f"/products/{self.ids['Desk lamp']}/")
+        other = Sellers.objects.create(name="Other", username="other", password="!")
+        self.client.post("/products/", {"name": "Lamp", "price": "1", "quantity": 1, "category": "lighting"},
+                         headers={"Authorization": f"Bearer {generate_jwt(other.id)}"})
+
+        self.assertEqual(sorted(self.names(q="lamp")), ["Lamp shade", "Lampshade", "Reading lamp"])
+
+    def test_query_without_letters_or_digits_answers_400(self):
+        self.assertEqual(self.client.get("/products/search/", {"q": "  --"}).status_code, 400)
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.seller = Sellers.objects.create(name="Seller", username="etag", password="!")
+        self.client.defaults["HTTP_AUTHORIZATION"] = f"Bearer {generate_jwt(self.seller.id)}"
+        response = self.client.post("/products/", {"name": "Lamp", "price": "2.00", "quantity": 5,
+                                                   "category": "home"})
+        self.product_id = json.loads(response.content)["data"]["id"]
+
+    def revalidate(self, url):
+        etag = self.client.get(url)["ETag"]
+        return self.client.get(url, headers={"If-None-Match": etag})
+
+    def test_unchanged_list_and_detail_answer_304(self):
+        for url in ["/products/", f"/products/{self.product_id}/"]:
+            response = self.revalidate(url)
+            self.assertEqual(response.status_code, 304, url)
+            self.assertEqual(response.content, b"")
+            self.assertIn("Authorization", response["Vary"])
+
+    def test_product_change_invalidates_list_and_detail(self):
+        list_etag = self.client.get("/products/")["ETag"]
+        detail_etag = self.client.get(f"/products/{self.product_id}/")["ETag"]
+
+        create_order(seller=self.seller, order_type="OUTGOING", items=[{"product_id": self.product_id,
+                                                                        "quantity": 1}])
+
+        self.assertEqual(self.client.get("/products/", headers={"If-None-Match": list_etag}).status_code, 200)
+        self.assertEqual(self.client.get(f"/products/{self.product_id}/",
+                                         headers={"If-None-Match": detail_etag}).status_code, 200)
+
+    def test_etag_depends_on_the_query_and_the_seller(self):
+        etag = self.client.get("/products/")["ETag"]
+        other = Sellers.objects.create(name="Other", username="other", password="!")
+
+        self.assertNotEqual(self.client.get("/products/?limit=1")["ETag"], etag)
+        self.assertEqual(self.client.get("/products/", headers={"If-None-Match": etag,
+                                                               "Authorization": f"Bearer {generate_jwt(other.id)}"})
+                         .status_code, 200)
+
+
+class ProductPaginationTests(TestCase):
+    def setUp(self):
+        self.seller = Sellers.objects.create(name="Seller", username="pages", password="!")
+        self.client.defaults["HTTP_AUTHORIZATION"] = f"Bearer {generate_jwt(self.seller.id)}"
+        for index in range(7):
+            response = self.client.post("/products/", {"name": f"Item {index}", "price": "1.25", "quantity": index,
+                                                       "category": "home", "expiry": "2030-01-01"})
+            self.assertEqual(response.status_code, 201, response.content)
+        Products.objects.create(seller=self.seller, name="Deleted", price=1, quantity=1, category="home",
+                                is_deleted=True)
+
+    def get(self, **params):
+        return self.client.get("/products/", params)
+
+    def test_cursor_and_page_walk_every_product_once(self):
+        expected = list(Products.objects.filter(seller=self.seller, is_deleted=False).order_by("id")
+                        .values_list("id", flat=True))
+        by_cursor = []
+        cursor = None
+        while True:
+            data = json.loads(self.get(limit=3, **({"cursor": cursor} if cursor else {})).content)["data"]
+            by_cursor += [product["id"] for product in data["products"]]
+            cursor = data["next_cursor"]
+            if cursor is None:
+                break
+        by_page = [product["id"] for page in (1, 2, 3)
+                   for product in json.loads(self.get(limit=3, page=page).content)["data"]["products"]]
+
+        self.assertEqual(by_cursor, expected)
+        self.assertEqual(by_page, expected)
+
+    def test_invalid_parameters_answer_400(self):
+        for params in [{"cursor": "not-a-cursor"}, {"cursor": "YQ"}, {"limit": "-1"}, {"limit": "ten"},
+                       {"page": "0"}, {"stream": "xml"}, {"stream": "json", "chunk_size": "0"}]:
+            self.assertEqual(self.get(**params).status_code, 400, params)
+
+    def test_streams_match_the_paginated_payload(self):
+        page = self.get(limit=500).content
+        products = json.loads(page)["data"]["products"]
+
+        streamed = b"".join(self.get(stream="json", chunk_size=2).streaming_content)
+        ndjson = b"".join(self.get(stream="ndjson", chunk_size=2).streaming_content)
+
+        self.assertEqual(streamed, page.replace(b',"next_cursor":null', b""))
+        self.assertEqual(ndjson, b"".join(dumps(product) + b"\n" for product in products))
+
+
+class ProductImportTests(TestCase):
+    def setUp(self):
+        self.seller = Sellers.objects.create(name="Seller", username="importer", password="!")
+        self.client.defaults["HTTP_AUTHORIZATION"] = f"Bearer {generate_jwt(self.seller.id)}"
+
+    def csv_file(self, rows, tail=b""):
+        lines = ["name,price,quantity,category", *(f"Item {index},1.50,2,home" for index in range(rows))]
+        return SimpleUploadedFile("products.csv", "\n".join(lines).encode() + b"\n" + tail)
+
+    def test_undecodable_file_answers_400(self):
+        response = self.client.post("/products/import/", {"file": self.csv_file(1, tail=b"Bad \xff,1,1,home\n")})
+
+        self.assertEqual(response.status_code, 400, response.content)
+        body = json.loads(response.content)
+        self.assertIn("UTF-8", body["msg"])
+        self.assertEqual(body["data"]["created"], 0)
+
+    def test_error_after_a_committed_batch_reports_the_created_rows(self):
+        # The decoder reads ahead in 8 KB chunks, so the bad bytes have to sit past the first chunk.
+        upload = self.csv_file(1000, tail=b"Bad \xff,1,1,home\n")
+
+        with self.assertRaises(ProductImportError) as raised:
+            import_products(self.seller, iter_import_rows(upload, "csv"), batch_size=10)
+
+        created = raised.exception.result["created"]
+        self.assertGreater(created, 0)
+        self.assertEqual(Products.objects.filter(seller=self.seller).count(), created)
+        self.assertEqual(InventorySummary.objects.get(seller=self.seller).sku_count, created)
+
+    def test_malformed_csv_answers_400(self):
+        upload = SimpleUploadedFile("products.csv", b'name,price,quantity,category\n"' + b"x" * 200000 + b"\n")
+
+        response = self.client.post("/products/import/", {"file": upload})
+
+        self.assertEqual(response.status_code, 400, response.content)
+        self.assertIn("Invalid CSV", json.loads(response.content)["msg"])
+
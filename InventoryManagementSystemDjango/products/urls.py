@@ -1,7 +1,14 @@
 from django.urls import path
-from .views import ProductListView, ProductDetailView
+from .views import ProductListView, ProductDetailView, ProductImportView, ProductListAsyncView, ProductDetailAsyncView, \
+    ProductSummaryView, ProductSearchView, ProductStockView
 
 urlpatterns = [
     path('', ProductListView.as_view(), name='product-list'),
+    path('import/', ProductImportView.as_view(), name='product-import'),
+    path('search/', ProductSearchView.as_view(), name='product-search'),
+    path('summary/', ProductSummaryView.as_view(), name='product-summary'),
     path('<int:id>/', ProductDetailView.as_view(), name='product-detail'),
+    path('<int:id>/stock/', ProductStockView.as_view(), name='product-stock'),
+    path('async/', ProductListAsyncView.as_view(), name='product-list-async'),
+    path('async/<int:id>/', ProductDetailAsyncView.as_view(), name='product-detail-async'),
 ]
@@ -1,10 +1,19 @@
 from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F
+from django.views import View
 from rest_framework import status
 from rest_framework.views import APIView
 
-from .models import Products
+from .models import Products, InventorySummary, ProductTrigram, StockMovement, StockSnapshot
+from core.models import ResourceVersion
 from core.utils import success_response, error_response, get_user_from_request, validate_product_fields, parse_expiry, \
-    get_product_for_seller
+    get_product_for_seller, serialize_product, parse_limit, encode_cursor, streaming_success_response, \
+    iter_import_rows, import_products, paginate_products, split_page, aget_user_from_request, json_success_response, \
+    json_error_response, search_products, get_collection_etag, etag_matches, not_modified_response, with_etag, \
+    make_etag, parse_as_of, ProductImportError
+from core.routers import current_shard
+from core.images import schedule_image_processing, delete_image_variants
 
 
 # Create your views here.
@@ -15,19 +24,37 @@ class ProductListView(APIView):
             return error
 
         try:
-            products = Products.objects.filter(seller=seller, is_deleted=False)
-            data = [{"id": p.id,
-                     "name": p.name,
-                     "price": p.price,
-                     "quantity": p.quantity,
-                     "category": p.category,
-                     "expiry": p.expiry,
-                     "image": p.image.url if p.image else None
-                     } for p in products]
-
-            return success_response(data={"products": data},
-                                    msg="Products fetched successfully",
-                                    status_code=status.HTTP_200_OK)
+            etag = get_collection_etag(seller, request, "products")
+            if etag_matches(request, etag):
+                return not_modified_response(etag)
+
+            products = Products.objects.filter(seller=seller, is_deleted=False).order_by("id")
+
+            stream = request.query_params.get("stream")
+            if stream:
+                if stream not in ["json", "ndjson"]:
+                    raise ValueError("Stream must be json or ndjson")
+                chunk_size = parse_limit(request.query_params.get("chunk_size"), default=2000, maximum=10000)
+                # The rows are fetched after the view and the routing middlewares have returned, so pin the
+                # database the routers pick for this request now.
+                products = products.using(products.db)
+                rows = (serialize_product(p) for p in products.iterator(chunk_size=chunk_size))
+                return with_etag(streaming_success_response(rows=rows,
+                                                            key="products",
+                                                            msg="Products fetched successfully",
+                                                            ndjson=stream == "ndjson"), etag)
+
+            page, limit = paginate_products(products, request.query_params)
+            products, next_cursor = split_page(list(page), limit, cursor=lambda p: encode_cursor(p.id))
+
+            return with_etag(success_response(data={"products": [serialize_product(p) for p in products],
+                                                    "next_cursor": next_cursor},
+                                              msg="Products fetched successfully",
+                                              status_code=status.HTTP_200_OK), etag)
+
+        except ValueError as e:
+            return error_response(msg=str(e),
+                                  status_code=status.HTTP_400_BAD_REQUEST)
 
         except Exception:
             return error_response(msg="Internal Server Error",
@@ -47,7 +74,15 @@ class ProductListView(APIView):
 
             image = request.FILES.get("image")
 
-            product = Products.objects.create(seller=seller, image=image, **parsed)
+            with transaction.atomic(using=current_shard()):
+                product = Products.objects.create(seller=seller, image=image, **parsed)
+                InventorySummary.record(seller.id, [(None, (product.quantity, product.price))])
+                StockMovement.record(seller.id, "CREATED", {product.id: product.quantity})
+                ProductTrigram.index([product])
+                ResourceVersion.bump(seller.id, "products")
+                if product.image:
+                    schedule_image_processing(product)
+
             return success_response(data={"id": product.id},
                                     msg="Product created successfully",
                                     status_code=status.HTTP_201_CREATED)
@@ -61,6 +96,126 @@ class ProductListView(APIView):
                                   status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+class ProductImportView(APIView):
+    def post(self, request):
+        seller, error = get_user_from_request(request)
+        if error:
+            return error
+
+        try:
+            upload = request.FILES.get("file")
+            if not upload:
+                raise ValueError("File is required")
+
+            file_format = request.data.get("format") or upload.name.rsplit(".", 1)[-1]
+            rows = iter_import_rows(upload, file_format.strip().lower())
+            result = import_products(seller=seller, rows=rows)
+
+            return success_response(data=result,
+                                    msg="Products imported successfully",
+                                    status_code=status.HTTP_201_CREATED)
+
+        except ProductImportError as e:
+            return error_response(msg=str(e),
+                                  status_code=status.HTTP_400_BAD_REQUEST,
+                                  data=e.result)
+
+        except ValueError as e:
+            return error_response(msg=str(e),
+                                  status_code=status.HTTP_400_BAD_REQUEST)
+
+        except Exception:
+            return error_response(msg="Internal Server Error",
+                                  status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class ProductSearchView(APIView):
+    def get(self, request):
+        seller, error = get_user_from_request(request)
+        if error:
+            return error
+
+        try:
+            query = request.query_params.get("q", "")
+            limit = parse_limit(request.query_params.get("limit"), default=20, maximum=100)
+            page = request.query_params.get("page", "1")
+            if not page.isdigit() or int(page) <= 0:
+                raise ValueError("Page must be a positive integer")
+
+            result = search_products(seller=seller,
+                                     query=query,
+                                     category=request.query_params.get("category"),
+                                     limit=limit,
+                                     page=int(page))
+
+            return success_response(data=result,
+                                    msg="Products fetched successfully",
+                                    status_code=status.HTTP_200_OK)
+
+        except ValueError as e:
+            return error_response(msg=str(e),
+                                  status_code=status.HTTP_400_BAD_REQUEST)
+
+        except Exception:
+            return error_response(msg="Internal Server Error",
+                                  status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class ProductSummaryView(APIView):
+    def get(self, request):
+        seller, error = get_user_from_request(request)
+        if error:
+            return error
+
+        try:
+            summary = InventorySummary.objects.filter(seller=seller).first() or InventorySummary(seller=seller)
+            return success_response(data={"stock_units": summary.stock_units,
+                                          "stock_value": summary.stock_value,
+                                          "sku_count": summary.sku_count,
+                                          "low_stock_count": summary.low_stock_count
+                                          },
+                                    msg="Inventory summary fetched successfully",
+                                    status_code=status.HTTP_200_OK)
+
+        except Exception:
+            return error_response(msg="Internal Server Error",
+                                  status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class ProductStockView(APIView):
+    def get(self, request, id):
+        seller, error = get_user_from_request(request)
+        if error:
+            return error
+
+        try:
+            product = get_product_for_seller(id, seller)
+            as_of = parse_as_of(request.GET.get("as_of"))
+            quantity = StockSnapshot.stock_as_of([product.id], as_of)[product.id]
+            if quantity is None:
+                return error_response(msg="No stock history for this product at that time",
+                                      status_code=status.HTTP_404_NOT_FOUND)
+
+            return success_response(data={"product_id": product.id,
+                                          "as_of": as_of,
+                                          "quantity": quantity
+                                          },
+                                    msg="Stock fetched successfully",
+                                    status_code=status.HTTP_200_OK)
+
+        except ValueError as e:
+            return error_response(msg=str(e),
+                                  status_code=status.HTTP_400_BAD_REQUEST)
+
+        except Products.DoesNotExist:
+            return error_response(msg="Product not found",
+                                  status_code=status.HTTP_404_NOT_FOUND)
+
+        except Exception:
+            return error_response(msg="Internal Server Error",
+                                  status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 class ProductDetailView(APIView):
     def get(self, request, id):
         seller, error = get_user_from_request(request)
@@ -69,17 +224,13 @@ class ProductDetailView(APIView):
 
         try:
             product = get_product_for_seller(id, seller)
-            return success_response(
-                data={"id": product.id,
-                      "name": product.name,
-                      "price": product.price,
-                      "quantity": product.quantity,
-                      "category": product.category,
-                      "expiry": product.expiry,
-                      "image": product.image.url if product.image else None
-                      },
-                msg="Product fetched successfully",
-                status_code=status.HTTP_200_OK)
+            etag = make_etag("product", product.id, product.version)
+            if etag_matches(request, etag):
+                return not_modified_response(etag)
+
+            return with_etag(success_response(data=serialize_product(product),
+                                              msg="Product fetched successfully",
+                                              status_code=status.HTTP_200_OK), etag)
 
         except Products.DoesNotExist:
             return error_response("Product not found", status.HTTP_404_NOT_FOUND)
@@ -98,14 +249,34 @@ class ProductDetailView(APIView):
 
             for key, value in parsed.items():
                 setattr(product, key, value)
+            fields = [*parsed, "version"]
 
             new_image = request.FILES.get("image")
             if new_image:
                 if product.image and default_storage.exists(product.image.name):
                     default_storage.delete(product.image.name)
+                delete_image_variants(product)
                 product.image = new_image
+                product.image_variants = {}
+                fields += ["image", "image_variants"]
 
-            product.save()
+            with transaction.atomic(using=current_shard()):
+                # Orders change quantity with F() updates, so the stock state and the ledger delta come from the
+                # locked row, and only the fields in the request are written back.
+                current = Products.objects.select_for_update().only("quantity", "price").get(id=product.id,
+                                                                                               is_deleted=False)
+                before = (current.quantity, current.price)
+                product.quantity = parsed.get("quantity", current.quantity)
+                product.price = parsed.get("price", current.price)
+                StockMovement.record(seller.id, "ADJUSTMENT", {product.id: product.quantity - current.quantity})
+                product.version = F("version") + 1
+                product.save(update_fields=fields)
+                InventorySummary.record(seller.id, [(before, (product.quantity, product.price))])
+                ResourceVersion.bump(seller.id, "products")
+                if "name" in parsed or "category" in parsed:
+                    ProductTrigram.index([product])
+                if new_image:
+                    schedule_image_processing(product)
 
             return success_response(msg="Product updated successfully",
                                     status_code=status.HTTP_200_OK)
@@ -133,3 +304,44 @@ class ProductDetailView(APIView):
         except Products.DoesNotExist:
             return error_response(msg="Product not found",
                                   status_code=status.HTTP_404_NOT_FOUND)
+
+
+class ProductListAsyncView(View):
+    async def get(self, request):
+        seller, error = await aget_user_from_request(request)
+        if error:
+            return error
+
+        try:
+            products = Products.objects.filter(seller=seller, is_deleted=False).order_by("id")
+            page, limit = paginate_products(products, request.GET)
+            products, next_cursor = split_page([p async for p in page], limit, cursor=lambda p: encode_cursor(p.id))
+
+            return json_success_response(data={"products": [serialize_product(p) for p in products],
+                                               "next_cursor": next_cursor},
+                                         msg="Products fetched successfully",
+                                         status_code=status.HTTP_200_OK)
+
+        except ValueError as e:
+            return json_error_response(msg=str(e),
+                                       status_code=status.HTTP_400_BAD_REQUEST)
+
+        except Exception:
+            return json_error_response(msg="Internal Server Error",
+                                       status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class ProductDetailAsyncView(View):
+    async def get(self, request, id):
+        seller, error = await aget_user_from_request(request)
+        if error:
+            return error
+
+        product = await Products.objects.filter(id=id, seller=seller, is_deleted=False).afirst()
+        if not product:
+            return json_error_response(msg="Product not found",
+                                       status_code=status.HTTP_404_NOT_FOUND)
+
+        return json_success_response(data=serialize_product(product),
+                                     msg="Product fetched successfully",
+                                     status_code=status.HTTP_200_OK)
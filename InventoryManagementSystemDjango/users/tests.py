@@ -1,3 +1,140 @@
-from django.test import TestCase
+import json
+import threading
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.test import TestCase, override_settings
+
+from core import passwords
+from core.cache import seller_cache
+from core.utils import generate_jwt, generate_tokens, get_seller, invalidate_seller
+from .models import Sellers
+
+
+class AuthTokenTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = Sellers.objects.create(name="Seller", username="seller", password=make_password("secret"))
+
+    def setUp(self):
+        # Sellers are cached by id, and ids are reused once other tests roll back.
+        invalidate_seller(self.seller.id)
+
+    def test_refresh_token_is_rejected_for_api_requests(self):
+        tokens = generate_tokens(self.seller)
+
+        response = self.client.get(f"/sellers/{self.seller.id}",
+                                   headers={"Authorization": f"Bearer {tokens['refresh_token']}"})
+        allowed = self.client.get(f"/sellers/{self.seller.id}",
+                                  headers={"Authorization": f"Bearer {tokens['token']}"})
+
+        self.assertEqual(response.status_code, 401, response.content)
+        self.assertIn("Refresh tokens cannot be used", json.loads(response.content)["msg"])
+        self.assertEqual(allowed.status_code, 200, allowed.content)
+
+    def test_refresh_token_exchanges_for_a_new_pair(self):
+        response = self.client.post("/sellers/token/refresh",
+                                    {"refresh_token": generate_tokens(self.seller)["refresh_token"]})
+
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertIn("token", json.loads(response.content)["data"])
+
+
+class SellerCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = Sellers.objects.create(name="Seller", username="seller", password=make_password("secret"))
+
+    def setUp(self):
+        invalidate_seller(self.seller.id)
+        self.client.defaults["HTTP_AUTHORIZATION"] = f"Bearer {generate_jwt(self.seller.id)}"
+
+    def patch(self, **data):
+        response = self.client.patch(f"/sellers/{self.seller.id}", json.dumps(data), content_type="application/json")
+        self.assertEqual(response.status_code, 200, response.content)
+
+    def test_authenticated_seller_is_served_from_the_cache(self):
+        get_seller(self.seller.id)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(get_seller(self.seller.id).username, "seller")
+
+    def test_process_local_cache_expires_within_the_local_ttl(self):
+        self.assertEqual(seller_cache.ttl, min(settings.SELLER_CACHE_TTL, settings.SELLER_CACHE_LOCAL_TTL))
+
+    def test_profile_change_is_visible_on_the_next_request(self):
+        get_seller(self.seller.id)
+
+        self.patch(name="Renamed")
+
+        response = self.client.get(f"/sellers/{self.seller.id}")
+        self.assertEqual(json.loads(response.content)["data"]["seller_name"], "Renamed")
+
+    def test_password_change_revokes_cached_refresh_tokens(self):
+        refresh_token = generate_tokens(get_seller(self.seller.id))["refresh_token"]
+
+        self.patch(password="changed")
+
+        response = self.client.post("/sellers/token/refresh", {"refresh_token": refresh_token})
+        self.assertEqual(response.status_code, 401, response.content)
+        self.assertEqual(self.client.post("/sellers/login", {"username": "seller", "password": "changed"})
+                         .status_code, 200)
+
+    def test_deleted_seller_is_rejected_on_the_next_request(self):
+        get_seller(self.seller.id)
+
+        self.assertEqual(self.client.delete(f"/sellers/{self.seller.id}").status_code, 204)
+
+        self.assertEqual(self.client.get(f"/sellers/{self.seller.id}").status_code, 401)
+
+
+@override_settings(PASSWORD_WORKERS=1, PASSWORD_QUEUE_SIZE=0)
+class PasswordPoolTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = Sellers.objects.create(name="Seller", username="seller", password=make_password("secret"))
+
+    def setUp(self):
+        invalidate_seller(self.seller.id)
+        self.reset_pool()
+        self.addCleanup(self.reset_pool)
+
+    def reset_pool(self):
+        if passwords._executor is not None:
+            passwords._executor.shutdown(wait=True)
+        passwords._executor = passwords._slots = None
+
+    def login(self):
+        return self.client.post("/sellers/login", {"username": "seller", "password": "secret"})
+
+    def test_login_answers_503_when_every_worker_is_busy(self):
+        release = threading.Event()
+        with mock.patch("core.passwords.check_password", side_effect=lambda *args: release.wait(5)):
+            busy = passwords.submit_check_password("secret", self.seller.password)
+            response = self.login()
+            release.set()
+            busy.result()
+
+        self.assertEqual(response.status_code, 503, response.content)
+        self.assertEqual(response["Retry-After"], "1")
+
+    def test_login_succeeds_once_a_worker_is_free(self):
+        self.assertEqual(self.login().status_code, 200)
+        self.assertEqual(self.login().status_code, 200)
+
+
+class RegistrationTests(TestCase):
+    # Every shard, but not the replica mirrors, which share default's test database.
+    databases = set(settings.SHARD_DATABASES)
+
+    def register(self):
+        return self.client.post("/sellers/", {"name": "Seller", "username": "seller", "password": "secret"})
+
+    def test_seller_is_not_created_when_shard_assignment_fails(self):
+        with mock.patch("users.views.assign_shard", side_effect=RuntimeError("shard unavailable")):
+            response = self.register()
+
+        self.assertEqual(response.status_code, 500, response.content)
+        self.assertFalse(Sellers.objects.filter(username="seller").exists())
+        self.assertEqual(self.register().status_code, 201)
@@ -1,8 +1,11 @@
 from django.urls import path
-from .views import login, UserListView, UserDetailView
+from .views import login, refresh_token, UserListView, UserDetailView, UserDetailAsyncView, LoginAsyncView
 
 urlpatterns = [
     path('', UserListView.as_view(), name='seller-list'),
     path("<int:id>", UserDetailView.as_view(), name='seller-detailed'),
     path('login', login, name="login"),
+    path('token/refresh', refresh_token, name="token-refresh"),
+    path("async/<int:id>", UserDetailAsyncView.as_view(), name='seller-detailed-async'),
+    path('async/login', LoginAsyncView.as_view(), name="login-async"),
 ]
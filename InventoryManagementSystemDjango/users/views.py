@@ -1,10 +1,19 @@
-from django.contrib.auth.hashers import make_password, check_password
+import json
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
 from rest_framework import status
 from rest_framework.decorators import api_view
 from rest_framework.views import APIView
 
 from .models import Sellers
-from core.utils import success_response, error_response, generate_jwt, get_user_from_request
+from core.routers import assign_shard
+from core.passwords import verify_password, averify_password, PasswordPoolBusy
+from core.utils import success_response, error_response, get_user_from_request, invalidate_seller, \
+    aget_user_from_request, json_success_response, json_error_response, generate_tokens, get_seller_from_refresh_token
 
 
 # Create your views here.
@@ -22,9 +31,12 @@ class UserListView(APIView):
                 return error_response(msg="Username already exists",
                                       status_code=status.HTTP_409_CONFLICT)
 
-            seller = Sellers.objects.create(name=name,
-                                            username=username,
-                                            password=make_password(password))
+            # The seller and its shard assignment commit together, so no seller is left without a shard.
+            with transaction.atomic():
+                seller = Sellers.objects.create(name=name,
+                                                username=username,
+                                                password=make_password(password))
+                assign_shard(seller)
 
             return success_response(data={"seller_id": seller.id},
                                     msg="Seller created successfully",
@@ -90,6 +102,7 @@ class UserDetailView(APIView):
                 seller.password = make_password(password.strip())
 
             seller.save()
+            invalidate_seller(seller.id)
 
             return success_response(msg="Seller updated successfully",
                                     status_code=status.HTTP_200_OK)
@@ -113,6 +126,7 @@ class UserDetailView(APIView):
                                       status_code=status.HTTP_403_FORBIDDEN)
 
             seller.delete()
+            invalidate_seller(seller.id)
 
             return success_response(msg="Seller deleted successfully",
                                     status_code=status.HTTP_204_NO_CONTENT)
@@ -133,12 +147,11 @@ def login(request):
 
         seller = Sellers.objects.filter(username=username, is_deleted=False).first()
 
-        if not seller or not check_password(password, seller.password):
+        if not seller or not verify_password(password, seller.password):
             return error_response(msg="Invalid credentials",
                                   status_code=status.HTTP_401_UNAUTHORIZED)
 
-        token = generate_jwt(seller.id)
-        return success_response(data={"token": token},
+        return success_response(data=generate_tokens(seller),
                                 msg="Login successful",
                                 status_code=status.HTTP_200_OK)
 
@@ -146,6 +159,90 @@ def login(request):
         return error_response(msg=str(e),
                               status_code=status.HTTP_400_BAD_REQUEST)
 
+    except PasswordPoolBusy as e:
+        response = error_response(msg=str(e),
+                                  status_code=status.HTTP_503_SERVICE_UNAVAILABLE)
+        response["Retry-After"] = "1"
+        return response
+
     except Exception as e:
         return error_response(msg="Internal Server Error",
                               status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(["POST"])
+def refresh_token(request):
+    try:
+        seller, error = get_seller_from_refresh_token(request.data.get("refresh_token"))
+        if error:
+            return error_response(msg=error,
+                                  status_code=status.HTTP_401_UNAUTHORIZED)
+
+        return success_response(data=generate_tokens(seller),
+                                msg="Token refreshed successfully",
+                                status_code=status.HTTP_200_OK)
+
+    except Exception:
+        return error_response(msg="Internal Server Error",
+                              status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class UserDetailAsyncView(View):
+    async def get(self, request, id):
+        seller, error = await aget_user_from_request(request)
+        if error:
+            return error
+
+        if seller.id != id:
+            return json_error_response(msg="Forbidden Access",
+                                       status_code=status.HTTP_403_FORBIDDEN)
+
+        return json_success_response(data={"seller_id": seller.id,
+                                           "seller_name": seller.name,
+                                           "seller_username": seller.username
+                                           },
+                                     msg="Seller fetched successfully",
+                                     status_code=status.HTTP_200_OK)
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class LoginAsyncView(View):
+    async def post(self, request):
+        try:
+            if request.content_type == "application/json":
+                data = json.loads(request.body or b"{}")
+                if not isinstance(data, dict):
+                    raise ValueError("Request body must be a JSON object")
+            else:
+                data = request.POST
+
+            username = str(data.get("username", "")).strip()
+            password = str(data.get("password", "")).strip()
+
+            if not username or not password:
+                raise ValueError("Username and password are required")
+
+            seller = await Sellers.objects.filter(username=username, is_deleted=False).afirst()
+
+            # PBKDF2 is CPU bound; run it in the password worker pool so it does not block the event loop.
+            if not seller or not await averify_password(password, seller.password):
+                return json_error_response(msg="Invalid credentials",
+                                           status_code=status.HTTP_401_UNAUTHORIZED)
+
+            return json_success_response(data=generate_tokens(seller),
+                                         msg="Login successful",
+                                         status_code=status.HTTP_200_OK)
+
+        except ValueError as e:
+            return json_error_response(msg=str(e),
+                                       status_code=status.HTTP_400_BAD_REQUEST)
+
+        except PasswordPoolBusy as e:
+            response = json_error_response(msg=str(e),
+                                           status_code=status.HTTP_503_SERVICE_UNAVAILABLE)
+            response["Retry-After"] = "1"
+            return response
+
+        except Exception:
+            return json_error_response(msg="Internal Server Error",
+                                       status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)